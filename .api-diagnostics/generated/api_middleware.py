@@ -1,174 +1,426 @@
 
 # API Diagnostics Middleware for Flask - Auto-generated
-import json
+import atexit
+import io
 import logging
+import logging.handlers
+import os
+import queue
 import time
-import traceback
-import uuid
-from datetime import datetime
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from functools import wraps
 from typing import Optional
 
-from flask import Flask, request, g, jsonify, Response
+from flask import Flask, request, Response, has_request_context
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+# Prefer orjson's C encoder when the host app has it installed
+try:
+    import orjson
+
+    def _json_str(obj) -> str:
+        return orjson.dumps(obj, default=str).decode('utf-8')
+except ImportError:
+    import json
+
+    def _json_str(obj) -> str:
+        return json.dumps(obj, default=str)
+
+# Correlation IDs are 16-char hex tokens handed out from a pre-generated pool,
+# so the random source is read once per CORRELATION_ID_POOL_SIZE requests
+CORRELATION_ID_POOL_SIZE = 512
+_correlation_ids = iter(())
+
+
+def _new_correlation_id() -> str:
+    """Return the next pooled correlation ID, refilling the pool when it runs out"""
+    global _correlation_ids
+    try:
+        # list iterators hand out each item once, even across threads
+        return next(_correlation_ids)
+    except StopIteration:
+        pool = os.urandom(8 * CORRELATION_ID_POOL_SIZE).hex()
+        _correlation_ids = iter([pool[i:i + 16] for i in range(0, len(pool), 16)])
+        return next(_correlation_ids)
+
+
+# Correlation ID of the request being handled; read by get_correlation_id()
+_correlation_id_var: ContextVar[Optional[str]] = ContextVar("api_diagnostics_correlation_id", default=None)
+
+# environ key the WSGI wrapper stores (correlation_id, start_time) under
+_ENVIRON_KEY = "api_diagnostics"
+
+# environ key set by the error handler once it has logged the request's error record
+_ERROR_LOGGED_KEY = "api_diagnostics.error_logged"
+
+# Request bodies are truncated to this many bytes in logs
+MAX_BODY_LOG = 500
+
+# Error responses share one shape; only the request-specific values are
+# substituted (JSON-escaped where they may contain user input)
+_ERROR_BODY_TEMPLATE = (
+    '{{"error":true,"message":{message},"correlation_id":{correlation_id},'
+    '"timestamp":"{timestamp}","endpoint":{endpoint}}}'
 )
+
+# Configure logging: request threads only enqueue records, a single
+# listener thread owns the real handler and does the formatting and I/O
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 256
+
+# Optional JSON-lines log file, searchable with `api-diagnostics search --logs <file>`
+LOG_FILE = os.environ.get("API_DIAGNOSTICS_LOG_FILE")
+LOG_FILE_BUFFER_SIZE = 64 * 1024
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops the newest record instead of blocking when full"""
+
+    def prepare(self, record):
+        # Hand the record over unformatted so message and traceback
+        # rendering happen on the listener thread, not the request thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """Queue listener that drains records in batches and flushes handlers once per batch"""
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            try:
+                while len(batch) < LOG_BATCH_SIZE:
+                    batch.append(q.get_nowait())
+            except queue.Empty:
+                pass
+
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+                q.task_done()
+
+            for handler in self.handlers:
+                handler.flush()
+
+            if stop:
+                break
+
+
+class _DeferredFlushMixin:
+    """Write records without flushing; the listener flushes once per batch"""
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class _BatchStreamHandler(_DeferredFlushMixin, logging.StreamHandler):
+    pass
+
+
+class _BatchFileHandler(_DeferredFlushMixin, logging.FileHandler):
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=LOG_FILE_BUFFER_SIZE, encoding=self.encoding)
+
+
+def _iso(ts: float) -> str:
+    """Materialize an ISO timestamp from a time.time() value, only when it is needed"""
+    # Naive UTC, like the rest of the log timestamps; utcfromtimestamp is deprecated
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class JsonFormatter(logging.Formatter):
+    """Render each record as one JSON line, merging the structured `api` payload"""
+
+    def format(self, record):
+        data = {
+            "timestamp": _iso(record.created),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        data.update(getattr(record, "api", None) or {})
+        if record.exc_info:
+            data["stack_trace"] = self.formatException(record.exc_info)
+        return _json_str(data)
+
+
+# Configure only our own logger: no basicConfig, and no propagation into the
+# host application's root handlers
 logger = logging.getLogger("api_diagnostics")
+logger.propagate = False
+
+if not logger.handlers:  # the host app (or an earlier import) may have configured it already
+    logger.setLevel(logging.INFO)
+
+    _log_handlers = [_BatchStreamHandler()]
+    if LOG_FILE:
+        _log_handlers.append(_BatchFileHandler(LOG_FILE, encoding='utf-8'))
+    for _handler in _log_handlers:
+        _handler.setFormatter(JsonFormatter())
+
+    _queue_handler = _DroppingQueueHandler(None)  # queue set by _start_log_listener
+    logger.addHandler(_queue_handler)
+
+    def _start_log_listener():
+        """Start this process's listener thread on a fresh queue"""
+        global _log_listener
+        _queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        _log_listener = _BatchingQueueListener(_queue_handler.queue, *_log_handlers,
+                                               respect_handler_level=True)
+        _log_listener.start()
+
+    def _stop_log_listener():
+        """Drain the queue and stop the current listener"""
+        _log_listener.stop()
+
+    _start_log_listener()
+    atexit.register(_stop_log_listener)
+
+    # Threads don't survive fork(): workers of a preforking server (gunicorn
+    # --preload, uWSGI without lazy-apps) start their own listener
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_start_log_listener)
 
 
 class FlaskAPIDebugger:
-    def __init__(self, app: Flask = None, log_requests: bool = True, log_responses: bool = True):
+    __slots__ = ('log_requests', 'log_responses', 'capture_body')
+
+    def __init__(self, app: Flask = None, log_requests: bool = True, log_responses: bool = True,
+                 capture_body: bool = False):
         self.log_requests = log_requests
         self.log_responses = log_responses
+        # Body capture buffers the upload before the view runs, so it is opt-in
+        self.capture_body = capture_body
         if app:
             self.init_app(app)
 
     def init_app(self, app: Flask):
         """Initialize the Flask app with API debugging middleware"""
-        app.before_request(self._before_request)
-        app.after_request(self._after_request)
+        # One WSGI wrapper handles every request; only errors go through Flask's handler lookup
+        app.wsgi_app = _CorrelationMiddleware(app.wsgi_app, self)
         app.errorhandler(Exception)(self._handle_exception)
 
-    def _before_request(self):
-        """Process incoming request"""
-        # Extract or generate correlation ID
-        correlation_id = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-        short_id = correlation_id[:8]
-
-        # Store in Flask's g object for access throughout request
-        g.correlation_id = correlation_id
-        g.short_id = short_id
-        g.start_time = time.time()
-        g.timestamp = datetime.utcnow().isoformat()
-
-        # Log incoming request
-        if self.log_requests:
-            self._log_request(correlation_id, short_id)
-
-    def _after_request(self, response: Response):
-        """Process outgoing response"""
-        if not hasattr(g, 'correlation_id'):
-            return response
-
-        # Add correlation ID to response headers
-        response.headers['X-Correlation-ID'] = g.correlation_id
-
-        # Log successful response
-        if self.log_responses and hasattr(g, 'start_time'):
-            process_time = time.time() - g.start_time
-            self._log_response(g.correlation_id, g.short_id, response, process_time)
-
-        return response
-
     def _handle_exception(self, error):
         """Handle all exceptions with enhanced logging and response"""
-        if not hasattr(g, 'correlation_id'):
-            g.correlation_id = str(uuid.uuid4())
-            g.short_id = g.correlation_id[:8]
-            g.start_time = time.time()
-            g.timestamp = datetime.utcnow().isoformat()
+        req = request._get_current_object()
+
+        state = req.environ.get(_ENVIRON_KEY)
+        if state is None:
+            # Error raised outside the WSGI wrapper (e.g. app.wsgi_app replaced after init_app)
+            correlation_id, start_time = _new_correlation_id(), time.time()
+            headers = [('X-Correlation-ID', correlation_id)]
+        else:
+            correlation_id, start_time = state
+            headers = None  # the WSGI wrapper adds X-Correlation-ID
+        short_id = correlation_id[:8]
 
-        process_time = time.time() - g.start_time if hasattr(g, 'start_time') else 0
+        process_time = time.time() - start_time
 
         # Determine error type and status code
-        if hasattr(error, 'code') and error.code:
+        status_code = getattr(error, 'code', None)
+        if status_code:
             # HTTP exceptions (400, 404, etc.)
-            status_code = error.code
             message = getattr(error, 'description', str(error))
-            self._log_http_exception(g.correlation_id, g.short_id, error, process_time)
+            self._log_http_exception(req, correlation_id, short_id, error, process_time)
         else:
             # Server errors (500)
             status_code = 500
             message = "Internal server error"
-            self._log_server_error(g.correlation_id, g.short_id, error, process_time)
+            self._log_server_error(req, correlation_id, short_id, error, process_time)
+        # The error record already carries the status; the WSGI wrapper skips its response record
+        req.environ[_ERROR_LOGGED_KEY] = True
 
         # Create enhanced error response
-        error_response = {
-            "error": True,
-            "message": message,
-            "correlation_id": g.correlation_id,
-            "timestamp": g.timestamp,
-            "endpoint": request.path
-        }
-
-        response = jsonify(error_response)
-        response.status_code = status_code
-        response.headers['X-Correlation-ID'] = g.correlation_id
-        return response
-
-    def _log_request(self, correlation_id: str, short_id: str):
+        body = _ERROR_BODY_TEMPLATE.format(
+            message=_json_str(str(message)),
+            correlation_id=_json_str(correlation_id),
+            timestamp=_iso(start_time),
+            endpoint=_json_str(req.path)
+        )
+
+        return Response(
+            body,
+            status=status_code,
+            mimetype='application/json',
+            headers=headers
+        )
+
+    def _log_request(self, environ, correlation_id: str):
         """Log incoming request details"""
         try:
-            # Get request body for POST/PUT requests
+            method = environ['REQUEST_METHOD']
+
+            # Read the request body for POST/PUT requests only when capture is enabled,
+            # then hand the view an in-memory copy of the consumed stream
             body = None
-            if request.method in ["POST", "PUT", "PATCH"]:
+            if self.capture_body and method in ("POST", "PUT", "PATCH"):
                 try:
-                    if request.is_json:
-                        body = json.dumps(request.get_json())[:500]  # Limit size
-                    elif request.data:
-                        body = request.data.decode('utf-8')[:500]
+                    length = int(environ.get('CONTENT_LENGTH') or 0)
+                    if length:
+                        data = environ['wsgi.input'].read(length)
+                        environ['wsgi.input'] = io.BytesIO(data)
+                        body = data[:MAX_BODY_LOG].decode('utf-8', 'replace')  # Limit size
                 except:
                     body = "<unable to read body>"
 
-            logger.info(f"🔍 [{short_id}] {request.method} {request.path}")
-            logger.info(f"   Correlation ID: {correlation_id}")
-            logger.info(f"   Timestamp: {g.timestamp}")
-            logger.info(f"   Client IP: {request.remote_addr}")
-            logger.info(f"   User-Agent: {request.headers.get('User-Agent', 'unknown')}")
+            # One structured record per request; serialized by the listener thread
+            payload = {
+                "correlation_id": correlation_id,
+                "method": method,
+                "endpoint": _path(environ),
+                "client_ip": environ.get('REMOTE_ADDR'),
+                "user_agent": environ.get('HTTP_USER_AGENT', 'unknown'),
+            }
             if body:
-                logger.info(f"   Request Body: {body}")
+                payload["request_body"] = body
+
+            logger.info("request", extra={"api": payload})
 
         except Exception as e:
-            logger.error(f"Error logging request: {e}")
+            logger.error("Error logging request: %s", e)
 
-    def _log_response(self, correlation_id: str, short_id: str, response: Response, process_time: float):
+    def _log_response(self, environ, correlation_id: str, status_code: int, process_time: float):
         """Log successful response"""
-        logger.info(f"✅ [{short_id}] {response.status_code} ({process_time:.3f}s)")
+        payload = {
+            "correlation_id": correlation_id,
+            "method": environ['REQUEST_METHOD'],
+            "endpoint": _path(environ),
+            "status_code": status_code,
+            "process_time": round(process_time, 3),
+        }
+        logger.info("response", extra={"api": payload})
 
-    def _log_http_exception(self, correlation_id: str, short_id: str, error, process_time: float):
+    def _log_http_exception(self, req, correlation_id: str, short_id: str, error, process_time: float):
         """Log HTTP exceptions (400, 404, etc.)"""
-        status_code = getattr(error, 'code', 'unknown')
-        message = getattr(error, 'description', str(error))
-
-        logger.error(f"❌ [{short_id}] {status_code} {message} ({process_time:.3f}s)")
-        logger.error(f"   Correlation ID: {correlation_id}")
-        logger.error(f"   Endpoint: {request.path}")
-        logger.error(f"   Method: {request.method}")
+        payload = {
+            "correlation_id": correlation_id,
+            "method": req.method,
+            "endpoint": req.path,
+            "status_code": getattr(error, 'code', 'unknown'),
+            "error_message": getattr(error, 'description', str(error)),
+            "process_time": round(process_time, 3),
+        }
+        logger.error("http_exception", extra={"api": payload})
 
-    def _log_server_error(self, correlation_id: str, short_id: str, error, process_time: float):
+    def _log_server_error(self, req, correlation_id: str, short_id: str, error, process_time: float):
         """Log unexpected server errors (500)"""
-        logger.error(f"🚫 [{short_id}] SERVER ERROR: {str(error)} ({process_time:.3f}s)")
-        logger.error(f"   Correlation ID: {correlation_id}")
-        logger.error(f"   Endpoint: {request.path}")
-        logger.error(f"   Method: {request.method}")
-        logger.error(f"   Stack trace: {traceback.format_exc()}")
+        payload = {
+            "correlation_id": correlation_id,
+            "method": req.method,
+            "endpoint": req.path,
+            "status_code": 500,
+            "error_message": str(error),
+            "process_time": round(process_time, 3),
+        }
+        logger.error("server_error", exc_info=error, extra={"api": payload})
+
+
+def _path(environ) -> str:
+    """Request path from the WSGI environ, decoded the way Flask's request.path is"""
+    return environ.get('PATH_INFO', '').encode('latin-1').decode('utf-8', 'replace') or '/'
+
+
+class _CorrelationMiddleware:
+    """WSGI wrapper around app.wsgi_app: a single call per request covers the
+    correlation ID, timing, response header and request/response logging"""
+
+    __slots__ = ('wsgi_app', 'debugger')
+
+    def __init__(self, wsgi_app, debugger: FlaskAPIDebugger):
+        self.wsgi_app = wsgi_app
+        self.debugger = debugger
+
+    def __call__(self, environ, start_response):
+        debugger = self.debugger
+
+        # Extract or generate correlation ID (16-char hex token, no UUID formatting);
+        # WSGI already exposes the header as a str, no request proxy involved
+        correlation_id = environ.get('HTTP_X_CORRELATION_ID') or _new_correlation_id()
+        start_time = time.time()
+        # Read back by the error handler
+        environ[_ENVIRON_KEY] = (correlation_id, start_time)
+
+        # Log incoming request (skip body extraction entirely when INFO is disabled)
+        log_info = logger.isEnabledFor(logging.INFO)
+        if debugger.log_requests and log_info:
+            debugger._log_request(environ, correlation_id)
+
+        correlation_header = ('X-Correlation-ID', correlation_id)
+        status_code = None
+
+        def start_response_wrapper(status, headers, exc_info=None):
+            nonlocal status_code
+            status_code = int(status[:3])
+            # Add correlation ID to response headers
+            headers.append(correlation_header)
+            return start_response(status, headers, exc_info)
+
+        cid_token = _correlation_id_var.set(correlation_id)
+        try:
+            response = self.wsgi_app(environ, start_response_wrapper)
+        finally:
+            _correlation_id_var.reset(cid_token)
+
+        # Log the response (errors were already logged by the error handler)
+        if (debugger.log_responses and log_info and status_code is not None
+                and _ERROR_LOGGED_KEY not in environ):
+            debugger._log_response(environ, correlation_id, status_code, time.time() - start_time)
+
+        return response
 
 
 # Helper function to get correlation ID in route handlers
 def get_correlation_id() -> Optional[str]:
-    """Get the correlation ID from Flask's g object"""
-    return getattr(g, 'correlation_id', None)
+    """Get the correlation ID of the current request"""
+    correlation_id = _correlation_id_var.get()
+    # The var is reset once the view returns; a streamed body (stream_with_context)
+    # is produced later, but still inside the request context
+    if correlation_id is None and has_request_context():
+        state = request.environ.get(_ENVIRON_KEY)
+        if state is not None:
+            correlation_id = state[0]
+    return correlation_id
 
 
 # Decorator for individual route debugging
 def debug_route(f):
-    """Decorator to add extra debugging to specific routes"""
+    """Decorator to add extra debugging to specific routes
+
+    The level is checked once at decoration time: with INFO disabled the
+    route is returned unwrapped, so set the log level before defining routes.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return f
+
+    f_name = f.__name__
+
     @wraps(f)
     def decorated_function(*args, **kwargs):
         correlation_id = get_correlation_id()
         short_id = correlation_id[:8] if correlation_id else 'unknown'
 
-        logger.info(f"🎯 [{short_id}] Entering route: {f.__name__}")
+        logger.info("🎯 [%s] Entering route: %s", short_id, f_name)
 
         try:
             result = f(*args, **kwargs)
-            logger.info(f"🎯 [{short_id}] Route completed: {f.__name__}")
+            logger.info("🎯 [%s] Route completed: %s", short_id, f_name)
             return result
         except Exception as e:
-            logger.error(f"🎯 [{short_id}] Route error in {f.__name__}: {str(e)}")
+            logger.error("🎯 [%s] Route error in %s: %s", short_id, f_name, e)
             raise
 
     return decorated_function
@@ -180,6 +432,7 @@ def debug_route(f):
 #
 # app = Flask(__name__)
 # debugger = FlaskAPIDebugger(app)
+# debugger = FlaskAPIDebugger(app, capture_body=True)  # also log request bodies
 #
 # @app.route('/users/<int:user_id>')
 # @debug_route
@@ -8,9 +8,21 @@ setup(
     install_requires=[
         "click>=8.0.0",
     ],
+    extras_require={
+        # Optional accelerators, used automatically when installed
+        "fast": [
+            "google-re2>=1.0",
+            "orjson>=3.0",
+        ],
+        # Test suite; run it in parallel with `pytest -n auto --dist loadgroup`
+        "dev": [
+            "pytest",
+            "pytest-xdist",
+        ],
+    },
     entry_points={
         'console_scripts': [
-            'api-diagnostics=src.commands:cli',
+            'api-diagnostics=src.commands:main',
         ],
     },
     python_requires=">=3.8",
@@ -3,8 +3,26 @@ CLI Commands for API Diagnostics Tool
 Handles user interaction and command parsing
 """
 
+import json
 import click
 from pathlib import Path
+from typing import List, Optional
+
+# Config file I/O uses orjson when installed, stdlib json otherwise
+try:
+    import orjson
+
+    def _load_config(config_file: Path) -> dict:
+        return orjson.loads(config_file.read_bytes())
+
+    def _save_config(config_file: Path, config: dict) -> None:
+        config_file.write_bytes(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+except ImportError:
+    def _load_config(config_file: Path) -> dict:
+        return json.loads(config_file.read_text())
+
+    def _save_config(config_file: Path, config: dict) -> None:
+        config_file.write_text(json.dumps(config, indent=2))
 
 
 @click.group()
@@ -18,7 +36,6 @@ def cli():
 @click.option('--auto', is_flag=True, help='Automatically inject code into project files')
 def init(project_path, auto):
     """Initialize API diagnostics in a project"""
-    import json
     from integrations import detect_project, setup_integration, setup_integration_automatically
 
     project_dir = Path(project_path)
@@ -60,7 +77,7 @@ def init(project_path, auto):
     }
 
     config_file = config_dir / 'config.json'
-    config_file.write_text(json.dumps(config_content, indent=2))
+    _save_config(config_file, config_content)
 
     # Setup integration (automatic or manual)
     if project_info:
@@ -127,10 +144,9 @@ def start():
     # Update config to enabled
     config_file = config_dir / 'config.json'
     if config_file.exists(): # why does .exists work on a variable
-        import json
-        config = json.loads(config_file.read_text())
+        config = _load_config(config_file)
         config['enabled'] = True
-        config_file.write_text(json.dumps(config, indent=2))
+        _save_config(config_file, config)
 
     click.echo('✅ API monitoring started')
     click.echo('   Correlation tracking is now active')
@@ -148,10 +164,9 @@ def stop():
     # Update config to disabled
     config_file = config_dir / 'config.json'
     if config_file.exists():
-        import json
-        config = json.loads(config_file.read_text())
+        config = _load_config(config_file)
         config['enabled'] = False
-        config_file.write_text(json.dumps(config, indent=2))
+        _save_config(config_file, config)
 
     click.echo('⏹️  API monitoring stopped')
 
@@ -159,8 +174,9 @@ def stop():
 @cli.command()
 @click.argument('correlation_id')
 @click.option('--format', 'output_format', default='human', type=click.Choice(['human', 'json', 'compact']), help='Output format')
+@click.option('--limit', default=100, help='Maximum number of entries to show')
 @click.option('--logs', help='Comma-separated list of log file paths to search')
-def search(correlation_id, output_format, logs):
+def search(correlation_id, output_format, limit, logs):
     """Search logs by correlation ID"""
     from core import search_logs_by_correlation_id, format_log_entry, validate_correlation_id
 
@@ -183,7 +199,7 @@ def search(correlation_id, output_format, logs):
         click.echo('   Searching default log locations...')
 
     # Search for entries
-    entries = search_logs_by_correlation_id(correlation_id, log_paths)
+    entries = search_logs_by_correlation_id(correlation_id, log_paths, limit)
 
     if not entries:
         click.echo('❌ No log entries found with that correlation ID')
@@ -203,6 +219,9 @@ def search(correlation_id, output_format, logs):
         if i < len(entries):
             click.echo('-' * 40)
 
+    if len(entries) >= limit:
+        click.echo(f'\n⚠️  Showing the first {limit} entries; there may be more (use --limit to raise it)')
+
 
 @cli.command()
 def status():
@@ -216,8 +235,7 @@ def status():
 
     config_file = config_dir / 'config.json'
     if config_file.exists():
-        import json
-        config = json.loads(config_file.read_text())
+        config = _load_config(config_file)
         status = "🟢 ACTIVE" if config.get('enabled') else "🔴 STOPPED"
         click.echo(f"Status: {status}")
         click.echo(f"Log Level: {config.get('log_level', 'ERROR')}")
@@ -330,5 +348,19 @@ def clean():
         click.echo(f'❌ Error removing integration: {e}')
 
 
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the CLI in-process and return its exit code instead of exiting"""
+    try:
+        result = cli.main(args=argv, prog_name='api-diagnostics', standalone_mode=False)
+    except click.ClickException as e:
+        e.show()
+        return e.exit_code
+    except click.Abort:
+        click.echo('Aborted!', err=True)
+        return 1
+    # --help and ctx.exit() come back as their exit code; commands return None
+    return result if isinstance(result, int) else 0
+
+
 if __name__ == '__main__':
     cli()
@@ -3,15 +3,26 @@ Core Business Logic for API Diagnostics
 Handles correlation IDs, logging, and error processing
 """
 
+import heapq
+import mmap
+import os
+import re
+import secrets
 import uuid
 import json
 import logging
-from datetime import datetime
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from typing import List, Optional, Dict, Any
 from dataclasses import dataclass
 
 
-@dataclass
+# slots=True drops the per-instance __dict__ (Python 3.10+; older versions keep it)
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class LogEntry:
     timestamp: str
     level: str  # 'ERROR', 'INFO', 'DEBUG'
@@ -24,16 +35,61 @@ class LogEntry:
     request_body: Optional[str] = None
 
 
+# Correlation ID shapes: hyphenated UUID, uuid4().hex, or the middleware's 16-char token
+_CORRELATION_ID_RE = re.compile(
+    r'\A(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|[0-9a-f]{32}|[0-9a-f]{16})\Z',
+    re.IGNORECASE,
+)
+
+# Middleware text log format: [correlation_id] METHOD endpoint STATUS
+_LOG_LINE_RE = re.compile(r'\[([a-f0-9-]+)\]\s+(\w+)\s+(\S+)\s+(\d{3})')
+
+# Error-line prefilters, compiled once; RE2's linear-time automaton is used
+# for bulk log scanning when the optional google-re2 package is installed
+try:
+    import re2 as _scan_re
+except ImportError:
+    _scan_re = re
+
+_ERROR_LINE_PATTERNS = {
+    '400': _scan_re.compile(rb'400|Bad Request'),
+    '500': _scan_re.compile(rb'500|Internal Server Error|ERROR'),
+    'error': _scan_re.compile(rb'ERROR|error|40[0134]|50[023]'),
+}
+
+# Status code bounds [low, high) for each error_type filter
+_ERROR_STATUS_RANGES = {
+    '400': (400, 500),
+    '500': (500, float('inf')),
+    'error': (400, float('inf')),
+}
+
+# Upper bound on threads used to scan several log files at once
+_MAX_SCAN_WORKERS = 8
+
+# Block size for reading log files backwards from the end
+_TAIL_BLOCK_SIZE = 64 * 1024
+
+# Bytes copied per slice when counting line numbers inside a mapped log file
+_NEWLINE_COUNT_CHUNK = 1 << 20
+
+
 def generate_correlation_id() -> str:
     """Generate unique correlation ID using UUID4"""
     return str(uuid.uuid4())
 
 
-def validate_correlation_id(correlation_id: str) -> bool:
-    """Validate correlation ID format (must be valid UUID)"""
+def validate_correlation_id(correlation_id: str, strict: bool = False) -> bool:
+    """Validate correlation ID format (UUID, or 16-char hex token from the middleware)
+
+    With strict=True the ID must parse as a UUID.
+    """
     if not correlation_id or not isinstance(correlation_id, str):
         return False
 
+    if not strict:
+        return _CORRELATION_ID_RE.match(correlation_id) is not None
+
     try:
         # Try to parse as UUID - will raise ValueError if invalid
         uuid.UUID(correlation_id)
@@ -52,13 +108,21 @@ def format_correlation_id(correlation_id: str) -> str:
 
 def generate_short_id() -> str:
     """Generate shorter correlation ID for easier reading (8 chars)"""
-    full_id = generate_correlation_id()
-    return full_id[:8]
+    return secrets.token_hex(4)
 
 
-def format_log_entry(entry: LogEntry, format_type: str = 'json') -> str:
-    """Format log entry for display in different formats"""
-    if format_type == 'json':
+_NL = "\n"
+_ERR_EMOJI = "❌"
+_OK_EMOJI = "✅"
+
+# JSON rendering uses orjson when installed (it serializes dataclasses natively)
+try:
+    import orjson
+
+    def _entry_to_json(entry: LogEntry) -> str:
+        return orjson.dumps(entry, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    def _entry_to_json(entry: LogEntry) -> str:
         return json.dumps({
             'timestamp': entry.timestamp,
             'level': entry.level,
@@ -71,14 +135,20 @@ def format_log_entry(entry: LogEntry, format_type: str = 'json') -> str:
             'request_body': entry.request_body
         }, indent=2)
 
+
+def format_log_entry(entry: LogEntry, format_type: str = 'json') -> str:
+    """Format log entry for display in different formats"""
+    if format_type == 'json':
+        return _entry_to_json(entry)
+
     elif format_type == 'human':
         short_id = format_correlation_id(entry.correlation_id)
-        status_emoji = "❌" if entry.status_code >= 400 else "✅"
+        status_emoji = _ERR_EMOJI if entry.status_code >= 400 else _OK_EMOJI
 
         lines = [
             f"{status_emoji} [{short_id}] {entry.method} {entry.endpoint}",
             f"   Status: {entry.status_code}",
-            f"   Time: {entry.timestamp}",
+            f"   Time: {entry.timestamp or '-'}",
             f"   Correlation ID: {entry.correlation_id}"
         ]
 
@@ -89,25 +159,30 @@ def format_log_entry(entry: LogEntry, format_type: str = 'json') -> str:
             lines.append(f"   Request: {entry.request_body[:100]}...")
 
         if entry.stack_trace:
-            lines.append(f"   Stack Trace: {entry.stack_trace.split(chr(10))[0]}...")
+            lines.append(f"   Stack Trace: {entry.stack_trace.partition(_NL)[0]}...")
 
-        return "\n".join(lines)
+        return _NL.join(lines)
 
     elif format_type == 'compact':
         short_id = format_correlation_id(entry.correlation_id)
-        status_emoji = "❌" if entry.status_code >= 400 else "✅"
+        status_emoji = _ERR_EMOJI if entry.status_code >= 400 else _OK_EMOJI
         return f"{status_emoji} [{short_id}] {entry.status_code} {entry.method} {entry.endpoint} - {entry.error_message or 'OK'}"
 
     else:
         raise ValueError(f"Unknown format type: {format_type}")
 
 
+def _utc_now() -> datetime:
+    """Current UTC time as a naive datetime, matching the middleware's log timestamps"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 def create_log_entry(correlation_id: str, endpoint: str, method: str, status_code: int,
                     error_message: str = None, stack_trace: str = None,
                     request_body: str = None, level: str = 'INFO') -> LogEntry:
     """Create a structured log entry with current timestamp"""
     return LogEntry(
-        timestamp=datetime.now().isoformat(),
+        timestamp=_utc_now().isoformat(),
         level=level,
         correlation_id=correlation_id,
         endpoint=endpoint,
@@ -123,8 +198,9 @@ def parse_log_line(log_line: str) -> Optional[LogEntry]:
     """Parse a log line into structured LogEntry"""
     try:
         # Try to parse as JSON first (structured logs)
-        if log_line.strip().startswith('{'):
-            data = json.loads(log_line.strip())
+        stripped = log_line.strip()
+        if stripped.startswith('{'):
+            data = json.loads(stripped)
             return LogEntry(
                 timestamp=data.get('timestamp', ''),
                 level=data.get('level', 'INFO'),
@@ -137,12 +213,12 @@ def parse_log_line(log_line: str) -> Optional[LogEntry]:
                 request_body=data.get('request_body')
             )
 
-        # Try to parse common log formats
-        import re
+        # Try to parse common log formats; the bracketed correlation ID is
+        # required, so lines without '[' can skip the regex entirely
+        if '[' not in log_line:
+            return None
 
-        # Pattern for our middleware logs: [correlation_id] METHOD endpoint STATUS
-        pattern = r'\[([a-f0-9-]+)\]\s+(\w+)\s+([^\s]+)\s+(\d{3})'
-        match = re.search(pattern, log_line)
+        match = _LOG_LINE_RE.search(log_line)
 
         if match:
             correlation_id, method, endpoint, status_str = match.groups()
@@ -150,16 +226,14 @@ def parse_log_line(log_line: str) -> Optional[LogEntry]:
 
             # Extract error message if present
             error_message = None
-            if 'ERROR' in log_line or status_code >= 400:
-                # Try to extract error message after status code
-                error_match = re.search(r'\d{3}\s+(.+)', log_line)
-                if error_match:
-                    error_message = error_match.group(1).strip()
+            if status_code >= 400 or 'ERROR' in log_line:
+                # The error message is whatever follows the status code
+                error_message = log_line[match.end():].strip() or None
 
             level = 'ERROR' if status_code >= 400 else 'INFO'
 
             return LogEntry(
-                timestamp=datetime.now().isoformat(),  # Fallback timestamp
+                timestamp='',  # Text format carries no timestamp
                 level=level,
                 correlation_id=correlation_id,
                 endpoint=endpoint,
@@ -181,39 +255,47 @@ def filter_log_entries(entries: List[LogEntry],
                       error_type: str = None,
                       endpoint: str = None,
                       method: str = None) -> List[LogEntry]:
-    """Filter log entries by various criteria"""
-    filtered = entries
+    """Filter log entries by various criteria (single pass over the entries)"""
+    correlation_id = correlation_id.lower() if correlation_id else None
+    endpoint = endpoint.lower() if endpoint else None
+    method = method.upper() if method else None
+    status_range = _ERROR_STATUS_RANGES.get(error_type) if error_type else None
 
-    if correlation_id:
-        filtered = [e for e in filtered if correlation_id.lower() in e.correlation_id.lower()]
+    if not (correlation_id or endpoint or method or status_range):
+        return entries
 
-    if error_type:
-        if error_type == '400':
-            filtered = [e for e in filtered if 400 <= e.status_code < 500]
-        elif error_type == '500':
-            filtered = [e for e in filtered if e.status_code >= 500]
-        elif error_type == 'error':
-            filtered = [e for e in filtered if e.status_code >= 400]
+    low, high = status_range or (0, float('inf'))
 
-    if endpoint:
-        filtered = [e for e in filtered if endpoint.lower() in e.endpoint.lower()]
+    # Status bucket alone is the common CLI case; keep it a bare comparison loop
+    if not (correlation_id or endpoint or method):
+        return [e for e in entries if low <= e.status_code < high]
 
-    if method:
-        filtered = [e for e in filtered if e.method.upper() == method.upper()]
+    filtered = []
+
+    # Logged IDs and paths are normally lowercase and methods uppercase, so try
+    # the raw field first and only case-fold it when that misses
+    for e in entries:
+        if not low <= e.status_code < high:
+            continue
+        if correlation_id and (correlation_id not in e.correlation_id
+                               and correlation_id not in e.correlation_id.lower()):
+            continue
+        if endpoint and endpoint not in e.endpoint and endpoint not in e.endpoint.lower():
+            continue
+        if method and e.method != method and e.method.upper() != method:
+            continue
+        filtered.append(e)
 
     return filtered
 
 
-def search_logs_by_correlation_id(correlation_id: str, log_paths: List[str] = None) -> List[LogEntry]:
+def search_logs_by_correlation_id(correlation_id: str, log_paths: List[str] = None,
+                                  limit: int = 100) -> List[LogEntry]:
     """Search log files for entries with specific correlation ID"""
     if not log_paths:
         log_paths = _get_default_log_paths()
 
-    entries = []
-    for log_path in log_paths:
-        entries.extend(_search_file_for_correlation_id(log_path, correlation_id))
-
-    return entries
+    return _search_files(_search_file_for_correlation_id, log_paths, correlation_id, limit)[:limit]
 
 
 def search_logs_by_error_type(error_type: str, log_paths: List[str] = None, limit: int = 50) -> List[LogEntry]:
@@ -221,11 +303,9 @@ def search_logs_by_error_type(error_type: str, log_paths: List[str] = None, limi
     if not log_paths:
         log_paths = _get_default_log_paths()
 
-    entries = []
-    for log_path in log_paths:
-        entries.extend(_search_file_for_errors(log_path, error_type, limit))
+    entries = _search_files(_search_file_for_errors, log_paths, error_type, limit)
 
-    return sorted(entries, key=lambda x: x.timestamp, reverse=True)[:limit]
+    return heapq.nlargest(limit, entries, key=lambda x: x.timestamp)
 
 
 def search_logs_recent(hours: int = 24, log_paths: List[str] = None, limit: int = 100) -> List[LogEntry]:
@@ -233,14 +313,43 @@ def search_logs_recent(hours: int = 24, log_paths: List[str] = None, limit: int
     if not log_paths:
         log_paths = _get_default_log_paths()
 
-    from datetime import datetime, timedelta
-    cutoff_time = datetime.now() - timedelta(hours=hours)
+    from datetime import timedelta
+    # Same clock as the log writers, so the ISO strings compare correctly
+    cutoff_time = _utc_now() - timedelta(hours=hours)
+
+    entries = _search_files(_search_file_recent, log_paths, cutoff_time, limit)
+
+    return heapq.nlargest(limit, entries, key=lambda x: x.timestamp)
+
 
+class LogSearcher:
+    """Search entry points over the default (or given) log files"""
+
+    @staticmethod
+    def search_by_correlation_id(correlation_id: str, log_paths: List[str] = None,
+                                 limit: int = 100) -> List[LogEntry]:
+        """Find log entries for a correlation ID (at most limit)"""
+        return search_logs_by_correlation_id(correlation_id, log_paths, limit)
+
+    @staticmethod
+    def filter_by_error_type(error_type: str, log_paths: List[str] = None, limit: int = 50) -> List[LogEntry]:
+        """Find recent entries of an error type ('400', '500' or 'error')"""
+        return search_logs_by_error_type(error_type, log_paths, limit)
+
+
+def _search_files(search_file, log_paths: List[str], *args) -> List[LogEntry]:
+    """Run a single-file search over each log path and combine the results in path order"""
     entries = []
-    for log_path in log_paths:
-        entries.extend(_search_file_recent(log_path, cutoff_time, limit))
+    if len(log_paths) > 1:
+        # File scans are I/O bound and release the GIL, so threads overlap them
+        with ThreadPoolExecutor(max_workers=min(_MAX_SCAN_WORKERS, len(log_paths))) as executor:
+            for file_entries in executor.map(lambda path: search_file(path, *args), log_paths):
+                entries.extend(file_entries)
+    else:
+        for log_path in log_paths:
+            entries.extend(search_file(log_path, *args))
 
-    return sorted(entries, key=lambda x: x.timestamp, reverse=True)[:limit]
+    return entries
 
 
 def _get_default_log_paths() -> List[str]:
@@ -272,8 +381,12 @@ def _get_default_log_paths() -> List[str]:
     return existing_paths
 
 
-def _search_file_for_correlation_id(log_path: str, correlation_id: str) -> List[LogEntry]:
-    """Search a single log file for correlation ID"""
+def _search_file_for_correlation_id(log_path: str, correlation_id: str, limit: int = 100) -> List[LogEntry]:
+    """Search a single log file for correlation ID
+
+    The file is memory-mapped and scanned for the ID directly, so only lines
+    that contain it are decoded and parsed.
+    """
     from pathlib import Path
 
     entries = []
@@ -282,58 +395,93 @@ def _search_file_for_correlation_id(log_path: str, correlation_id: str) -> List[
     if not log_file.exists():
         return entries
 
+    needle = re.compile(re.escape(correlation_id.encode('utf-8')), re.IGNORECASE)
+
     try:
-        with open(log_file, 'r', encoding='utf-8') as f:
-            for line_num, line in enumerate(f, 1):
-                if correlation_id.lower() in line.lower():
-                    entry = parse_log_line(line.strip())
+        with open(log_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return entries
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                line_num = 1
+                counted_to = 0
+                match = needle.search(mm)
+
+                while match:
+                    line_start = mm.rfind(b'\n', 0, match.start()) + 1
+                    line_end = mm.find(b'\n', match.end())
+                    if line_end == -1:
+                        line_end = len(mm)
+
+                    line_num += _count_newlines(mm, counted_to, line_start)
+                    counted_to = line_start
+
+                    line = mm[line_start:line_end].decode('utf-8', errors='replace').strip()
+                    entry = parse_log_line(line)
                     if entry:
                         entries.append(entry)
                     else:
                         # Create a basic entry for unparseable lines that contain the correlation ID
                         entries.append(LogEntry(
-                            timestamp=datetime.now().isoformat(),
+                            timestamp='',
                             level='INFO',
                             correlation_id=correlation_id,
                             endpoint='unknown',
                             method='unknown',
                             status_code=0,
-                            error_message=f'Raw log line {line_num}: {line.strip()[:100]}...'
+                            error_message=f'Raw log line {line_num}: {line[:100]}...'
                         ))
 
-    except (IOError, UnicodeDecodeError) as e:
+                    if len(entries) >= limit:
+                        break
+
+                    # Continue after this line so each line is reported once
+                    match = needle.search(mm, line_end + 1)
+
+    except (IOError, ValueError) as e:
         print(f"Error reading log file {log_path}: {e}")
 
     return entries
 
 
+def _count_newlines(buffer, start: int, end: int) -> int:
+    """Count newlines in buffer[start:end] without copying it all at once"""
+    count = 0
+    for offset in range(start, end, _NEWLINE_COUNT_CHUNK):
+        count += buffer[offset:min(offset + _NEWLINE_COUNT_CHUNK, end)].count(b'\n')
+    return count
+
+
 def _search_file_for_errors(log_path: str, error_type: str, limit: int) -> List[LogEntry]:
-    """Search a single log file for error entries"""
+    """Search a single log file for error entries
+
+    The file is memory-mapped and scanned with the error pattern directly, so
+    only lines that contain an error indicator are decoded and parsed.
+    """
     from pathlib import Path
 
     entries = []
     log_file = Path(log_path)
 
-    if not log_file.exists():
+    error_pattern = _ERROR_LINE_PATTERNS.get(error_type)
+    if not log_file.exists() or error_pattern is None:
         return entries
 
     try:
-        with open(log_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-
-                # Look for error indicators
-                is_error_line = False
-                if error_type == '400' and ('400' in line or 'Bad Request' in line):
-                    is_error_line = True
-                elif error_type == '500' and ('500' in line or 'Internal Server Error' in line or 'ERROR' in line):
-                    is_error_line = True
-                elif error_type == 'error' and ('ERROR' in line or 'error' in line or any(code in line for code in ['400', '401', '403', '404', '500', '502', '503'])):
-                    is_error_line = True
-
-                if is_error_line:
+        with open(log_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return entries
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                match = error_pattern.search(mm)
+
+                while match:
+                    line_start = mm.rfind(b'\n', 0, match.start()) + 1
+                    line_end = mm.find(b'\n', match.end())
+                    if line_end == -1:
+                        line_end = len(mm)
+
+                    line = mm[line_start:line_end].decode('utf-8', errors='replace').strip()
                     entry = parse_log_line(line)
                     if entry:
                         entries.append(entry)
@@ -341,14 +489,20 @@ def _search_file_for_errors(log_path: str, error_type: str, limit: int) -> List[
                     if len(entries) >= limit:
                         break
 
-    except (IOError, UnicodeDecodeError) as e:
+                    match = error_pattern.search(mm, line_end + 1)
+
+    except (IOError, ValueError) as e:
         print(f"Error reading log file {log_path}: {e}")
 
     return entries
 
 
 def _search_file_recent(log_path: str, cutoff_time, limit: int) -> List[LogEntry]:
-    """Search a single log file for recent entries"""
+    """Search a single log file for recent entries
+
+    Reads from the end of the file (like `tail`), so only the newest lines are
+    touched; stops at `limit` entries or the first entry older than the cutoff.
+    """
     from pathlib import Path
 
     entries = []
@@ -357,22 +511,46 @@ def _search_file_recent(log_path: str, cutoff_time, limit: int) -> List[LogEntry
     if not log_file.exists():
         return entries
 
-    try:
-        with open(log_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
+    cutoff_iso = cutoff_time.isoformat()
 
-                entry = parse_log_line(line)
-                if entry:
-                    # For now, include all parsed entries (timestamp filtering is complex)
-                    entries.append(entry)
+    try:
+        for line in _iter_lines_reverse(log_file):
+            line = line.strip()
+            if not line:
+                continue
+
+            entry = parse_log_line(line)
+            if entry:
+                # Entries without a known timestamp can't be placed, so keep them
+                if entry.timestamp and entry.timestamp < cutoff_iso:
+                    break
+                entries.append(entry)
 
                 if len(entries) >= limit:
                     break
 
-    except (IOError, UnicodeDecodeError) as e:
+    except IOError as e:
         print(f"Error reading log file {log_path}: {e}")
 
     return entries
+
+
+def _iter_lines_reverse(log_file, blocksize: int = _TAIL_BLOCK_SIZE):
+    """Yield the lines of a file from last to first, reading backwards in blocks"""
+    with open(log_file, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        carry = b''
+
+        while pos > 0:
+            read_size = min(blocksize, pos)
+            pos -= read_size
+            f.seek(pos)
+
+            lines = (f.read(read_size) + carry).split(b'\n')
+            # The first piece may be the tail of a line that starts in an earlier block
+            carry = lines[0]
+            for line in reversed(lines[1:]):
+                yield line.decode('utf-8', errors='replace')
+
+        yield carry.decode('utf-8', errors='replace')
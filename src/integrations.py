@@ -3,31 +3,64 @@ Framework Integration and Project Detection
 Handles detection of different frameworks and auto-configuration
 """
 
-import json
+import functools
+import heapq
 import os
+import re
+import time
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple
+
+# package.json parsing uses orjson when installed, stdlib json otherwise
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+
+# React indicators in package.json dependencies, and their quoted forms for
+# a bytes pre-check before parsing
+_REACT_DEPS = ('react', 'react-dom', '@types/react')
+_REACT_DEP_KEYS = tuple(f'"{dep}"'.encode() for dep in _REACT_DEPS)
 
 
-@dataclass
 class ProjectInfo:
-    type: str  # 'frontend', 'backend', 'fullstack'
-    frontend: Optional[str] = None  # 'react' only
-    backend: Optional[str] = None   # 'fastapi', 'flask'
-    package_manager: str = 'pip'    # 'pip', 'npm'
+    # Plain slotted class rather than a dataclass: importing dataclasses pulls in
+    # inspect and friends, which is most of this module's cold import time
+    __slots__ = ('type', 'frontend', 'backend', 'package_manager')
+
+    def __init__(self, type: str, frontend: Optional[str] = None,
+                 backend: Optional[str] = None, package_manager: str = 'pip'):
+        self.type = type                        # 'frontend', 'backend', 'fullstack'
+        self.frontend = frontend                # 'react' only
+        self.backend = backend                  # 'fastapi', 'flask'
+        self.package_manager = package_manager  # 'pip', 'npm'
+
+    def __repr__(self) -> str:
+        return (f"ProjectInfo(type={self.type!r}, frontend={self.frontend!r}, "
+                f"backend={self.backend!r}, package_manager={self.package_manager!r})")
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None
 
 
 def detect_frontend_framework(project_path: str) -> Optional[str]:
     """Check for React framework in package.json"""
     package_json_path = Path(project_path) / 'package.json'
 
-    if not package_json_path.exists():
-        return None
-
     try:
-        with open(package_json_path) as f:
-            package_data = json.load(f)
+        raw = package_json_path.read_bytes()
+
+        # Skip parsing unless one of the dependency names appears as a JSON key/string
+        if not any(key in raw for key in _REACT_DEP_KEYS):
+            return None
+
+        # Parse to confirm it's really a dependency, not a string value elsewhere
+        package_data = _json_loads(raw)
 
         # Combine regular and dev dependencies
         dependencies = {
@@ -36,54 +69,179 @@ def detect_frontend_framework(project_path: str) -> Optional[str]:
         }
 
         # Check for React (most common indicators)
-        if any(dep in dependencies for dep in ['react', 'react-dom', '@types/react']):
+        if any(dep in dependencies for dep in _REACT_DEPS):
             return 'react'
 
-    except (json.JSONDecodeError, FileNotFoundError, KeyError):
+    except (ValueError, OSError, KeyError):
         pass
 
     return None
 
 
-def detect_backend_framework(project_path: str) -> Optional[str]:
+# Directories that never hold the project's own app code
+_SKIP_DIRS = frozenset({
+    '.git', 'venv', '.venv', 'env', 'node_modules', '__pycache__',
+    '.tox', 'build', 'dist', 'site-packages',
+})
+
+# npm dependencies the interceptor needs (most are already in React projects)
+_PACKAGE_JSON_DEPS: Dict[str, str] = {}
+
+# Linux ioctl that makes dst share src's extents copy-on-write (a reflink)
+_FICLONE = 0x40049409
+
+# Date part of backup file names, computed once per process
+_BACKUP_DATE_PREFIX = time.strftime('%Y%m%d_')
+
+# Last counter value used in a backup name (see _next_backup_stamp)
+_last_backup_stamp = 0
+
+# Detection results are cached on disk per project, invalidated when a
+# top-level manifest or .py file changes, or after the TTL
+_DETECT_CACHE_FILE = os.path.join('.api-diagnostics', '.detect_cache.json')
+_DETECT_CACHE_TTL = 3600
+_DETECT_MANIFESTS = {'package.json', 'requirements.txt', 'pyproject.toml'}
+
+# Import lines, and the blank/comment lines allowed between them, for after_imports injection
+_IMPORT_LINE_RE = re.compile(r'^[^\S\n]*(?:import |from )', re.MULTILINE)
+_BLANK_OR_COMMENT_LINES_RE = re.compile(r'(?:[^\S\n]*(?:#[^\n]*)?\n)*')
+
+# Case-insensitive framework name check for candidate app entry files
+_FRAMEWORK_NAME_RE = {
+    'fastapi': re.compile('fastapi', re.IGNORECASE),
+    'flask': re.compile('flask', re.IGNORECASE),
+}
+
+# App code lives near the project root; deeper trees aren't walked
+_MAX_DETECT_DEPTH = 6
+
+# Directories (relative to the project) searched for app entry files
+_ENTRY_DIRS = ('', 'src', 'api')
+
+# Framework imports sit at the top of a module, so only the head is read
+_PY_HEAD_BYTES = 4096
+
+# Every indicator below contains one of these substrings
+_BACKEND_HINTS = (b'fastapi', b'FastAPI', b'flask', b'Flask', b'@app.')
+
+# Framework indicators, matched in a single pass over each file head
+_BACKEND_PATTERN = re.compile(
+    rb'(?P<fastapi>from fastapi import|import fastapi|FastAPI\(\)|@app\.get|@app\.post)'
+    rb'|(?P<flask>from flask import|import flask|Flask\(__name__\)|@app\.route)'
+)
+
+
+def detect_backend_framework(project_path: str, max_depth: int = _MAX_DETECT_DEPTH) -> Optional[str]:
     """Check for FastAPI or Flask in Python files"""
-    project_dir = Path(project_path)
+    root_depth = project_path.rstrip(os.sep).count(os.sep)
 
     # Check for Python files with framework imports
-    for py_file in project_dir.rglob('*.py'):
-        try:
-            with open(py_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-
-            # Check for FastAPI first (more specific)
-            if any(pattern in content for pattern in [
-                'from fastapi import',
-                'import fastapi',
-                'FastAPI()',
-                '@app.get',
-                '@app.post'
-            ]):
-                return 'fastapi'
-
-            # Check for Flask
-            elif any(pattern in content for pattern in [
-                'from flask import',
-                'import flask',
-                'Flask(__name__)',
-                '@app.route'
-            ]):
+    for dirpath, dirnames, filenames in os.walk(project_path, followlinks=False):
+        if dirpath.count(os.sep) - root_depth >= max_depth:
+            dirnames[:] = []
+        else:
+            dirnames[:] = [d for d in dirnames if d not in _SKIP_DIRS]
+
+        for filename in filenames:
+            if not filename.endswith('.py'):
+                continue
+
+            try:
+                with open(os.path.join(dirpath, filename), 'rb') as f:
+                    head = f.read(_PY_HEAD_BYTES)
+            except (PermissionError, OSError):
+                continue
+
+            # C-level substring checks reject most files before the regex runs
+            if not any(hint in head for hint in _BACKEND_HINTS):
+                continue
+
+            # FastAPI wins over Flask anywhere in the same file (more specific)
+            flask_found = False
+            for match in _BACKEND_PATTERN.finditer(head):
+                if match.lastgroup == 'fastapi':
+                    return 'fastapi'
+                flask_found = True
+
+            if flask_found:
                 return 'flask'
 
-        except (UnicodeDecodeError, PermissionError, OSError):
+    return None
+
+
+def _detection_fingerprint(project_path: str) -> tuple:
+    """(name, mtime_ns) of manifests and .py files in the top-level and entry-file directories"""
+    items = []
+    # One scan per directory _find_app_entry_contents looks in, so editing
+    # e.g. src/app.py invalidates the cached frameworks
+    for subdir in _ENTRY_DIRS:
+        try:
+            with os.scandir(os.path.join(project_path, subdir)) as it:
+                items.extend(
+                    (f"{subdir}/{entry.name}" if subdir else entry.name, entry.stat().st_mtime_ns)
+                    for entry in it
+                    if entry.name in _DETECT_MANIFESTS or entry.name.endswith('.py')
+                )
+        except OSError:
             continue
+    return tuple(sorted(items))
 
+
+def _load_detect_cache(project_path: str, fingerprint: tuple):
+    """Frameworks from the on-disk detection cache, or None if missing, stale or expired"""
+    try:
+        with open(os.path.join(project_path, _DETECT_CACHE_FILE), 'rb') as f:
+            cached = _json_loads(f.read())
+        if (time.time() - cached['saved_at'] < _DETECT_CACHE_TTL
+                and cached['fingerprint'] == [list(item) for item in fingerprint]):
+            return cached['frontend'], cached['backend']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
     return None
 
 
-def detect_project(project_path: str = '.') -> Optional[ProjectInfo]:
-    """Detect project type and frameworks"""
+def _save_detect_cache(project_path: str, fingerprint: tuple, frontend, backend) -> None:
+    """Atomically write the detection cache, if the project has been initialized"""
+    cache_file = os.path.join(project_path, _DETECT_CACHE_FILE)
+    if not os.path.isdir(os.path.dirname(cache_file)):
+        return
+
+    import json
+
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump({
+                'fingerprint': fingerprint,
+                'saved_at': time.time(),
+                'frontend': frontend,
+                'backend': backend,
+            }, f)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        try:
+            os.unlink(tmp_file)
+        except OSError:
+            pass
+
+
+@functools.lru_cache(maxsize=64)
+def _detect_frameworks(project_path: str, fingerprint: tuple):
+    """Cached framework detection, keyed on the project root and its file fingerprint"""
+    cached = _load_detect_cache(project_path, fingerprint)
+    if cached is not None:
+        return cached
+
     frontend = detect_frontend_framework(project_path)
     backend = detect_backend_framework(project_path)
+    _save_detect_cache(project_path, fingerprint, frontend, backend)
+    return frontend, backend
+
+
+def detect_project(project_path: str = '.') -> Optional[ProjectInfo]:
+    """Detect project type and frameworks"""
+    project_path = os.path.abspath(project_path)
+    frontend, backend = _detect_frameworks(project_path, _detection_fingerprint(project_path))
 
     if not frontend and not backend:
         return None
@@ -144,17 +302,15 @@ def setup_integration(project_info: ProjectInfo, project_path: str, auto_inject:
 
         if auto_inject:
             # Try to inject into main app files
-            app_files = _find_app_entry_files(project_dir, project_info.backend)
-            for app_file in app_files:
-                if _inject_backend_middleware(app_file, project_info.backend):
+            # The finder already read each file; hand that content to the injector
+            for app_file, content in _find_app_entry_contents(project_dir, project_info.backend):
+                if _inject_backend_middleware(app_file, project_info.backend, content):
                     files_modified.append(str(app_file))
 
-    # Update requirements/dependencies if auto-inject is enabled
-    if auto_inject:
-        if project_info.backend:
-            _update_python_requirements(project_dir)
-        if project_info.frontend:
-            _update_package_json(project_dir)
+    # Update dependencies if auto-inject is enabled. The backend middleware only
+    # uses the framework and the standard library, so requirements.txt is left alone
+    if auto_inject and project_info.frontend:
+        _update_package_json(project_dir)
 
     # Generate integration instructions
     instructions = generate_integration_instructions(project_info, auto_inject, files_modified)
@@ -206,122 +362,99 @@ def remove_integration(project_path: str) -> None:
         print('No integration found to remove')
 
 
-def generate_integration_instructions(project_info: ProjectInfo) -> str:
-    """Generate step-by-step integration instructions"""
-    instructions = ["# API Diagnostics Integration Instructions\n"]
-
-    if project_info.frontend == 'react':
-        instructions.extend([
-            "## Frontend Setup (React)",
-            "1. Copy `api-interceptor.js` to your `src/` directory",
-            "2. Import it in your main App.js or index.js:",
-            "   ```javascript",
-            "   import './api-interceptor.js';",
-            "   ```",
-            "3. That's it! All fetch() calls will now include correlation IDs\n"
-        ])
-
-    if project_info.backend in ['fastapi', 'flask']:
-        framework = project_info.backend.title()
-        instructions.extend([
-            f"## Backend Setup ({framework})",
-            "1. Copy `api_middleware.py` to your project directory",
-            "2. Import and add the middleware to your app:",
-        ])
+def backup_file(file_path: str) -> str:
+    """Create backup before modifying files"""
+    file_path = Path(file_path)
+    if not file_path.exists():
+        raise FileNotFoundError(f"File {file_path} does not exist")
 
-        if project_info.backend == 'fastapi':
-            instructions.extend([
-                "   ```python",
-                "   from api_middleware import APIDebugMiddleware",
-                "   app.add_middleware(APIDebugMiddleware)",
-                "   ```"
-            ])
-        else:  # flask
-            instructions.extend([
-                "   ```python",
-                "   from api_middleware import FlaskAPIDebugger",
-                "   debugger = FlaskAPIDebugger(app)",
-                "   ```",
-                "   Or for more control:",
-                "   ```python",
-                "   from api_middleware import FlaskAPIDebugger",
-                "   debugger = FlaskAPIDebugger()",
-                "   debugger.init_app(app)",
-                "   ```"
-            ])
+    # Create backup with a date prefix plus a monotonic counter, so backups
+    # taken within the same second don't overwrite each other
+    backup_path = file_path.with_suffix(
+        f"{file_path.suffix}.backup_{_BACKUP_DATE_PREFIX}{_next_backup_stamp()}"
+    )
 
-        instructions.append("3. Restart your server\n")
+    _clone_or_copy(file_path, backup_path)
+    return str(backup_path)
 
-    instructions.extend([
-        "## Usage",
-        "1. Run `api-diagnostics start` to enable monitoring",
-        "2. Make API calls from your frontend",
-        "3. Check browser console for correlation IDs",
-        "4. Search backend logs with `api-diagnostics search <correlation-id>`"
-    ])
 
-    return "\n".join(instructions)
+def _next_backup_stamp() -> int:
+    """time.monotonic_ns(), bumped so consecutive backups never share a name on coarse clocks"""
+    global _last_backup_stamp
+    _last_backup_stamp = max(time.monotonic_ns(), _last_backup_stamp + 1)
+    return _last_backup_stamp
 
 
-def backup_file(file_path: str) -> str:
-    """Create backup before modifying files"""
-    from datetime import datetime
+def _clone_or_copy(src: Path, dst: Path) -> None:
+    """Copy src to dst, as a copy-on-write reflink where the filesystem supports it"""
     import shutil
 
-    file_path = Path(file_path)
-    if not file_path.exists():
-        raise FileNotFoundError(f"File {file_path} does not exist")
-
-    # Create backup with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = file_path.with_suffix(f"{file_path.suffix}.backup_{timestamp}")
+    try:
+        import fcntl
+
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        shutil.copystat(src, dst)
+        return
+    except (ImportError, OSError):
+        # No fcntl (Windows), or no reflink support (ext4, tmpfs, cross-device)
+        pass
 
-    shutil.copy2(file_path, backup_path)
-    return str(backup_path)
+    shutil.copy2(src, dst)
 
 
 def restore_from_backup(file_path: str, backup_path: str = None) -> bool:
     """Restore file from backup"""
-    import shutil
-
     file_path = Path(file_path)
 
     if backup_path:
         backup_path = Path(backup_path)
     else:
         # Find the most recent backup
-        backup_pattern = f"{file_path.name}.backup_*"
-        backup_files = list(file_path.parent.glob(backup_pattern))
+        backup_files = get_backup_files(str(file_path))
 
         if not backup_files:
             return False
 
-        # Get the most recent backup
-        backup_path = max(backup_files, key=lambda p: p.stat().st_mtime)
+        backup_path = Path(backup_files[0])
 
     if not backup_path.exists():
         return False
 
-    shutil.copy2(backup_path, file_path)
+    # Copy next to the target and swap it in, so a failed restore never leaves a half-written file;
+    # a symlinked target is restored in place of the file it points to
+    file_path = Path(os.path.realpath(file_path))
+    tmp_path = _temp_sibling(file_path)
+    try:
+        _clone_or_copy(backup_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        _unlink_quietly(tmp_path)
+        raise
     return True
 
 
 def inject_code_safely(file_path: str, code: str, position: str = 'top',
-                      marker: str = None, check_existing: bool = True) -> bool:
-    """Safely inject code into existing files with validation"""
+                      marker: str = None, check_existing: bool = True,
+                      original_content: Optional[str] = None) -> bool:
+    """Safely inject code into existing files with validation
+
+    Callers that already read the file can pass its text as original_content.
+    """
     file_path = Path(file_path)
 
     if not file_path.exists():
         raise FileNotFoundError(f"File {file_path} does not exist")
 
     # Read current file content
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            original_content = f.read()
-    except UnicodeDecodeError:
-        # Try with different encoding
-        with open(file_path, 'r', encoding='latin-1') as f:
-            original_content = f.read()
+    if original_content is None:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                original_content = f.read()
+        except UnicodeDecodeError:
+            # Try with different encoding
+            with open(file_path, 'r', encoding='latin-1') as f:
+                original_content = f.read()
 
     # Check if code already exists (avoid duplicates)
     if check_existing and code.strip() in original_content:
@@ -341,30 +474,29 @@ def inject_code_safely(file_path: str, code: str, position: str = 'top',
     # Prepare the code with markers
     injected_code = f"{start_marker}\n{code}\n{end_marker}\n"
 
+    # Inject code based on position
+    if position == 'top':
+        new_content = injected_code + original_content
+    elif position == 'bottom':
+        new_content = original_content + "\n" + injected_code
+    elif position == 'after_imports':
+        new_content = _inject_after_imports(original_content, injected_code)
+    else:
+        raise ValueError(f"Unknown position: {position}")
+
+    # Validate the new content (basic syntax check, by file type) before
+    # touching the disk, so a rejected injection costs no backup or restore;
+    # types without a validator (JS/TS) are written as-is
+    validator = _SYNTAX_VALIDATORS.get(file_path.suffix)
+    if validator is not None and not validator(new_content):
+        return False
+
     # Create backup before modifying
     backup_path = backup_file(file_path)
 
     try:
-        # Inject code based on position
-        if position == 'top':
-            new_content = injected_code + original_content
-        elif position == 'bottom':
-            new_content = original_content + "\n" + injected_code
-        elif position == 'after_imports':
-            new_content = _inject_after_imports(original_content, injected_code)
-        else:
-            raise ValueError(f"Unknown position: {position}")
-
-        # Validate the new content (basic syntax check for Python files)
-        if file_path.suffix == '.py':
-            if not _validate_python_syntax(new_content):
-                # Restore from backup if syntax is invalid
-                restore_from_backup(file_path, backup_path)
-                return False
-
         # Write the modified content
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
+        _write_text_atomic(file_path, new_content)
 
         return True
 
@@ -384,40 +516,22 @@ def remove_injected_code(file_path: str, marker: str = None) -> bool:
     if not marker:
         marker = "api_diagnostics_injection"
 
-    start_marker = f"# START {marker} - Auto-generated by API Diagnostics"
-    end_marker = f"# END {marker}"
-
     # Read current content
     with open(file_path, 'r', encoding='utf-8') as f:
         content = f.read()
 
-    # Check if injection exists
-    if start_marker not in content:
+    # Check if a complete injection exists (the strip is a couple of str.find
+    # scans, so it doubles as the check and nothing is touched when it's a no-op)
+    new_content = _strip_injected_blocks(content, marker)
+    if new_content == content:
         return False  # Nothing to remove
 
     # Create backup before modifying
     backup_path = backup_file(file_path)
 
     try:
-        # Remove the injected code block
-        lines = content.split('\n')
-        new_lines = []
-        skip_lines = False
-
-        for line in lines:
-            if start_marker in line:
-                skip_lines = True
-                continue
-            elif end_marker in line:
-                skip_lines = False
-                continue
-            elif not skip_lines:
-                new_lines.append(line)
-
         # Write the cleaned content
-        new_content = '\n'.join(new_lines)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(new_content)
+        _write_text_atomic(file_path, new_content)
 
         return True
 
@@ -427,60 +541,144 @@ def remove_injected_code(file_path: str, marker: str = None) -> bool:
         raise e
 
 
+def _strip_injected_blocks(content: str, marker: str) -> str:
+    """Splice out each injected block, from the start marker's line through the end marker's line
+
+    A start marker without a matching end marker is left in place, along with
+    everything after it, rather than deleting the rest of the file.
+    """
+    start_marker = f"# START {marker} - Auto-generated by API Diagnostics"
+    end_marker = f"# END {marker}"
+
+    pieces = []
+    pos = 0
+    start = content.find(start_marker)
+    while start != -1:
+        end = content.find(end_marker, start + len(start_marker))
+        if end == -1:
+            break
+
+        pieces.append(content[pos:content.rfind('\n', 0, start) + 1])
+        pos = content.find('\n', end) + 1 or len(content)
+        start = content.find(start_marker, pos)
+
+    pieces.append(content[pos:])
+    return ''.join(pieces)
+
+
+def _write_text_atomic(file_path: Path, content: str) -> None:
+    """Write through a temp file and os.replace, so the target is never half-written"""
+    import shutil
+
+    # Replace the file a symlink points to, not the link itself
+    file_path = Path(os.path.realpath(file_path))
+    tmp_path = _temp_sibling(file_path)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        try:
+            shutil.copymode(file_path, tmp_path)
+        except FileNotFoundError:
+            pass  # New file: keep the default mode
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        _unlink_quietly(tmp_path)
+        raise
+
+
+def _temp_sibling(file_path: Path) -> Path:
+    """Hidden temp path in file_path's directory, so os.replace stays on one filesystem"""
+    return file_path.with_name(f".{file_path.name}.{os.getpid()}.tmp")
+
+
+def _unlink_quietly(path: Path) -> None:
+    """Remove a leftover temp file, ignoring errors"""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
 def _inject_after_imports(content: str, injected_code: str) -> str:
     """Inject code after import statements in Python files"""
-    lines = content.split('\n')
-    inject_line = 0
-
-    # Find the last import statement
-    for i, line in enumerate(lines):
-        stripped = line.strip()
-        if stripped.startswith('import ') or stripped.startswith('from '):
-            inject_line = i + 1
-        elif stripped and not stripped.startswith('#') and inject_line > 0:
-            # Found first non-import, non-comment line after imports
+    inject_at = 0
+    import_end = None
+
+    # Find the last import statement; stop at the first non-import,
+    # non-comment line after imports
+    for match in _IMPORT_LINE_RE.finditer(content):
+        # Back-to-back imports leave no gap to check
+        if import_end is not None and match.start() != import_end \
+                and not _BLANK_OR_COMMENT_LINES_RE.fullmatch(content, import_end, match.start()):
             break
 
+        line_end = content.find('\n', match.end())
+        if line_end == -1:
+            # Last import is the final line of the file
+            return content + '\n' + injected_code.rstrip()
+        import_end = inject_at = line_end + 1
+
     # Insert the injected code after imports
-    lines.insert(inject_line, injected_code.rstrip())
-    return '\n'.join(lines)
+    return content[:inject_at] + injected_code.rstrip() + '\n' + content[inject_at:]
 
 
+@functools.lru_cache(maxsize=32)
 def _validate_python_syntax(code: str) -> bool:
-    """Validate Python syntax without executing the code"""
-    import ast
-
+    """Validate Python syntax without executing the code (memoized by content)"""
     try:
-        ast.parse(code)
+        # Only success matters: the code object is dropped, no AST is materialized
+        compile(code, '<inject>', 'exec', dont_inherit=True)
         return True
-    except SyntaxError:
+    except (SyntaxError, ValueError):
         return False
 
 
+# Syntax check per file suffix, used by inject_code_safely
+_SYNTAX_VALIDATORS = {
+    '.py': _validate_python_syntax,
+}
+
+
+def _scan_backups(file_path: Path) -> List[Tuple[int, str]]:
+    """(mtime_ns, path) for each backup of file_path, from a single directory scan"""
+    prefix = f"{file_path.name}.backup_"
+
+    # Plain prefix test per entry; DirEntry caches its stat
+    try:
+        with os.scandir(file_path.parent) as it:
+            return [(entry.stat().st_mtime_ns, str(file_path.parent / entry.name))
+                    for entry in it if entry.name.startswith(prefix)]
+    except FileNotFoundError:
+        return []
+
+
 def get_backup_files(file_path: str) -> List[str]:
     """Get list of backup files for a given file"""
-    file_path = Path(file_path)
-    backup_pattern = f"{file_path.name}.backup_*"
-    backup_files = list(file_path.parent.glob(backup_pattern))
+    backups = _scan_backups(Path(file_path))
 
     # Sort by modification time (newest first)
-    backup_files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    backups.sort(reverse=True)
 
-    return [str(p) for p in backup_files]
+    return [path for _, path in backups]
 
 
 def clean_old_backups(file_path: str, keep_count: int = 5) -> int:
     """Clean old backup files, keeping only the most recent ones"""
-    backup_files = get_backup_files(file_path)
+    backups = _scan_backups(Path(file_path))
 
-    if len(backup_files) <= keep_count:
+    if len(backups) <= keep_count:
         return 0
 
+    # Only the newest keep_count need ordering; the rest are removed in any order
+    keep = {path for _, path in heapq.nlargest(keep_count, backups)}
+
     # Remove old backups
     removed_count = 0
-    for backup_file in backup_files[keep_count:]:
+    for _, backup_path in backups:
+        if backup_path in keep:
+            continue
         try:
-            Path(backup_file).unlink()
+            os.unlink(backup_path)
             removed_count += 1
         except OSError:
             pass
@@ -499,17 +697,30 @@ def _find_react_entry_files(project_dir: Path) -> List[Path]:
         'App.js'
     ]
 
-    found_files = []
-    for file_path in possible_files:
-        full_path = project_dir / file_path
-        if full_path.exists():
-            found_files.append(full_path)
+    present = _probe_entry_files(project_dir)
+    return [present[file_path] for file_path in possible_files if file_path in present]
 
-    return found_files
+
+def _probe_entry_files(project_dir: Path) -> Dict[str, Path]:
+    """Map 'name' / 'src/name' / 'api/name' to paths of the files that exist there
+
+    One scandir per directory covers every entry-file candidate, instead of
+    a stat per candidate path.
+    """
+    found = {}
+    for subdir in _ENTRY_DIRS:
+        try:
+            with os.scandir(project_dir / subdir) as it:
+                for entry in it:
+                    if entry.is_file():
+                        found[f"{subdir}/{entry.name}" if subdir else entry.name] = project_dir / subdir / entry.name
+        except OSError:
+            continue
+    return found
 
 
-def _find_app_entry_files(project_dir: Path, framework: str) -> List[Path]:
-    """Find main application files for backend injection"""
+def _find_app_entry_contents(project_dir: Path, framework: str) -> List[tuple]:
+    """Find main application files for backend injection, with their text"""
     if framework == 'fastapi':
         possible_files = [
             'main.py',
@@ -531,21 +742,29 @@ def _find_app_entry_files(project_dir: Path, framework: str) -> List[Path]:
     else:
         return []
 
+    present = _probe_entry_files(project_dir)
+
     found_files = []
     for file_path in possible_files:
-        full_path = project_dir / file_path
-        if full_path.exists():
-            # Check if it actually contains the framework
-            try:
-                content = full_path.read_text()
-                if framework.lower() in content.lower():
-                    found_files.append(full_path)
-            except (UnicodeDecodeError, PermissionError):
-                continue
+        if file_path not in present:
+            continue
+        full_path = present[file_path]
+        content = _read_text_if_exists(full_path)
+        # Check if it actually contains the framework (without lowercasing the whole file)
+        if content is not None and _FRAMEWORK_NAME_RE[framework].search(content):
+            found_files.append((full_path, content))
 
     return found_files
 
 
+def _read_text_if_exists(file_path: Path) -> Optional[str]:
+    """Read a text file in one open() call; None if it is missing or unreadable"""
+    try:
+        return file_path.read_text(encoding='utf-8')
+    except (UnicodeDecodeError, OSError):
+        return None
+
+
 def _inject_react_interceptor(react_file: Path, interceptor_code: str) -> bool:
     """Inject React interceptor into a React file"""
     try:
@@ -563,104 +782,60 @@ def _inject_react_interceptor(react_file: Path, interceptor_code: str) -> bool:
         return False
 
 
-def _inject_backend_middleware(app_file: Path, framework: str) -> bool:
-    """Inject backend middleware into the main app file"""
-    try:
-        if framework == 'fastapi':
-            middleware_code = '''
+# Code injected into backend app files, per framework
+_BACKEND_MIDDLEWARE_SNIPPETS = {
+    'fastapi': '''
 # API Diagnostics Integration
 from api_middleware import APIDebugMiddleware
 app.add_middleware(APIDebugMiddleware)
-'''
-        elif framework == 'flask':
-            middleware_code = '''
+''',
+    'flask': '''
 # API Diagnostics Integration
 from api_middleware import FlaskAPIDebugger
 debugger = FlaskAPIDebugger(app)
-'''
-        else:
-            return False
+''',
+}
+
+
+def _inject_backend_middleware(app_file: Path, framework: str, original_content: Optional[str] = None) -> bool:
+    """Inject backend middleware into the main app file"""
+    middleware_code = _BACKEND_MIDDLEWARE_SNIPPETS.get(framework)
+    if middleware_code is None:
+        return False
 
+    try:
         # Inject after the app creation
         return inject_code_safely(
             str(app_file),
             middleware_code,
             position='after_imports',
-            marker=f'{framework}_middleware'
+            marker=f'{framework}_middleware',
+            original_content=original_content
         )
     except Exception:
         return False
 
 
-def _update_python_requirements(project_dir: Path) -> bool:
-    """Add required dependencies to requirements.txt"""
-    requirements_file = project_dir / 'requirements.txt'
-
-    # Dependencies needed for our middleware
-    new_deps = [
-        'uuid',  # For correlation ID generation
-    ]
-
-    try:
-        if requirements_file.exists():
-            current_content = requirements_file.read_text()
-        else:
-            current_content = ""
-
-        # Check which dependencies are missing
-        missing_deps = []
-        for dep in new_deps:
-            if dep not in current_content:
-                missing_deps.append(dep)
-
-        if missing_deps:
-            # Add missing dependencies
-            new_content = current_content
-            if not new_content.endswith('\n') and new_content:
-                new_content += '\n'
-
-            new_content += '\n# API Diagnostics dependencies\n'
-            for dep in missing_deps:
-                new_content += f'{dep}\n'
-
-            # Create backup and write
-            if requirements_file.exists():
-                backup_file(str(requirements_file))
-
-            requirements_file.write_text(new_content)
-            return True
-
-    except Exception:
-        return False
-
-    return False
-
-
 def _update_package_json(project_dir: Path) -> bool:
     """Add required dependencies to package.json"""
     package_json = project_dir / 'package.json'
 
-    if not package_json.exists():
+    # Nothing to add, so don't parse and rewrite package.json at all
+    if not _PACKAGE_JSON_DEPS or not package_json.exists():
         return False
 
     try:
         import json
 
         # Read current package.json
-        with open(package_json, 'r') as f:
-            package_data = json.load(f)
-
-        # Dependencies we might need (most are already in React projects)
-        new_deps = {
-            # Most React projects already have these, but just in case
-        }
+        package_data = _json_loads(package_json.read_bytes())
 
         # Check if we need to add any dependencies
         dependencies = package_data.get('dependencies', {})
         dev_dependencies = package_data.get('devDependencies', {})
 
         needs_update = False
-        for dep, version in new_deps.items():
+        for dep, version in _PACKAGE_JSON_DEPS.items():
             if dep not in dependencies and dep not in dev_dependencies:
                 dependencies[dep] = version
                 needs_update = True
@@ -670,8 +845,7 @@ def _update_package_json(project_dir: Path) -> bool:
             backup_file(str(package_json))
 
             package_data['dependencies'] = dependencies
-            with open(package_json, 'w') as f:
-                json.dump(package_data, f, indent=2)
+            _write_text_atomic(package_json, json.dumps(package_data, indent=2))
 
             return True
 
@@ -702,14 +876,24 @@ def remove_integration_automatically(project_path: str) -> dict:
             'flask_app.py', 'application.py'
         ]
 
+        markers = ['react_interceptor', 'fastapi_middleware', 'flask_middleware', 'api_diagnostics_injection']
+
         for file_path in possible_files:
             full_path = project_dir / file_path
-            if full_path.exists():
-                # Try to remove different types of injections
-                markers = ['react_interceptor', 'fastapi_middleware', 'flask_middleware', 'api_diagnostics_injection']
-                for marker in markers:
-                    if remove_injected_code(str(full_path), marker):
-                        results['files_restored'].append(str(full_path))
+            content = _read_text_if_exists(full_path)
+            if content is None:
+                continue
+
+            # Strip every marker's blocks from one read, then back up and write once
+            new_content = content
+            for marker in markers:
+                if f"# START {marker} " in new_content:
+                    new_content = _strip_injected_blocks(new_content, marker)
+
+            if new_content != content:
+                backup_file(str(full_path))
+                _write_text_atomic(full_path, new_content)
+                results['files_restored'].append(str(full_path))
 
         # Remove the .api-diagnostics directory
         diagnostics_dir = project_dir / '.api-diagnostics'
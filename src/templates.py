@@ -12,8 +12,16 @@ FRONTEND_TEMPLATES = {
 (function() {
   'use strict';
 
+  // Native UUID4 where available (secure contexts in modern browsers)
+  const randomUUID = typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function'
+    ? crypto.randomUUID.bind(crypto)
+    : null;
+
   // Generate UUID4 (no external dependencies)
   function generateCorrelationId() {
+    if (randomUUID) {
+      return randomUUID();
+    }
     return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, function(c) {
       const r = Math.random() * 16 | 0;
       const v = c === 'x' ? r : (r & 0x3 | 0x8);
@@ -21,39 +29,30 @@ FRONTEND_TEMPLATES = {
     });
   }
 
-  // Format correlation ID for display (first 8 chars)
-  function formatCorrelationId(id) {
-    return id.substring(0, 8);
+  // Request and success logs are off by default; set window.__API_DIAG_VERBOSE = true to see them.
+  // Errors are always logged.
+  function isVerbose() {
+    return Boolean(window.__API_DIAG_VERBOSE);
   }
 
-  // Enhanced console logging
-  function logRequest(correlationId, url, method, timestamp) {
-    console.group(`🔍 [${formatCorrelationId(correlationId)}] ${method} ${url}`);
-    console.log('Full Correlation ID:', correlationId);
-    console.log('Timestamp:', timestamp);
-    console.log('Method:', method);
-    console.log('URL:', url);
-    console.groupEnd();
+  // Enhanced console logging: one console call per event, with the details in an
+  // object DevTools inspects lazily (shortId is the first 8 chars, computed once per request)
+  function logRequest(correlationId, shortId, url, method, timestamp) {
+    console.debug(`🔍 [${shortId}] ${method} ${url}`, { correlationId, timestamp, method, url });
   }
 
-  function logError(correlationId, url, status, statusText, timestamp) {
-    console.group(`❌ [${formatCorrelationId(correlationId)}] ${status} ${statusText}`);
-    console.error('Full Correlation ID:', correlationId);
-    console.error('URL:', url);
-    console.error('Status:', status, statusText);
-    console.error('Timestamp:', timestamp);
-    console.error('🔧 Search backend logs with: api-diagnostics search', correlationId);
-    console.groupEnd();
+  function logError(correlationId, shortId, url, status, statusText, timestamp) {
+    console.error(`❌ [${shortId}] ${status} ${statusText}`, {
+      correlationId, url, status, statusText, timestamp,
+      search: `api-diagnostics search ${correlationId}`
+    });
   }
 
-  function logNetworkError(correlationId, url, error, timestamp) {
-    console.group(`🚫 [${formatCorrelationId(correlationId)}] Network Error`);
-    console.error('Full Correlation ID:', correlationId);
-    console.error('URL:', url);
-    console.error('Error:', error.message);
-    console.error('Timestamp:', timestamp);
-    console.error('🔧 Search backend logs with: api-diagnostics search', correlationId);
-    console.groupEnd();
+  function logNetworkError(correlationId, shortId, url, error, timestamp) {
+    console.error(`🚫 [${shortId}] Network Error`, {
+      correlationId, url, error: error.message, timestamp,
+      search: `api-diagnostics search ${correlationId}`
+    });
   }
 
   // Store original fetch
@@ -62,6 +61,7 @@ FRONTEND_TEMPLATES = {
   // Override fetch with correlation tracking
   window.fetch = async function(url, options = {}) {
     const correlationId = generateCorrelationId();
+    const shortId = correlationId.substring(0, 8);  // For readable logs
     const timestamp = new Date().toISOString();
     const method = options.method || 'GET';
 
@@ -72,20 +72,23 @@ FRONTEND_TEMPLATES = {
     };
 
     // Log outgoing request
-    logRequest(correlationId, url, method, timestamp);
+    const verbose = isVerbose();
+    if (verbose) {
+      logRequest(correlationId, shortId, url, method, timestamp);
+    }
 
     try {
       const response = await originalFetch(url, { ...options, headers });
 
       if (!response.ok) {
-        logError(correlationId, url, response.status, response.statusText, timestamp);
-      } else {
-        console.log(`✅ [${formatCorrelationId(correlationId)}] ${response.status} ${response.statusText}`);
+        logError(correlationId, shortId, url, response.status, response.statusText, timestamp);
+      } else if (verbose) {
+        console.debug(`✅ [${shortId}] ${response.status} ${response.statusText}`);
       }
 
       return response;
     } catch (error) {
-      logNetworkError(correlationId, url, error, timestamp);
+      logNetworkError(correlationId, shortId, url, error, timestamp);
       throw error;
     }
   };
@@ -107,149 +110,379 @@ BACKEND_TEMPLATES = {
     'fastapi': {
         'middleware': '''
 # API Diagnostics Middleware - Auto-generated
-import json
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 import time
-import traceback
-import uuid
-from datetime import datetime
+from contextvars import ContextVar
 from typing import Optional
 
-from fastapi import Request, Response, HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
+from fastapi import Request, HTTPException
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: request handlers only enqueue records, a single
+# listener thread owns the real handler and does the formatting and I/O,
+# so log writes never block the event loop
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 256
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops the newest record instead of blocking when full"""
+
+    def prepare(self, record):
+        # Hand the record over unformatted so message and traceback
+        # rendering happen on the listener thread, not the event loop
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """Queue listener that drains records in batches and flushes handlers once per batch"""
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            try:
+                while len(batch) < LOG_BATCH_SIZE:
+                    batch.append(q.get_nowait())
+            except queue.Empty:
+                pass
+
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+                q.task_done()
+
+            for handler in self.handlers:
+                handler.flush()
+
+            if stop:
+                break
+
+
+class _BatchStreamHandler(logging.StreamHandler):
+    """Write records without flushing; the listener flushes once per batch"""
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+# Configure only our own logger: no basicConfig, and no propagation into the
+# host application's root handlers
 logger = logging.getLogger("api_diagnostics")
+logger.propagate = False
+
+if not logger.handlers:  # the host app (or an earlier import) may have configured it already
+    logger.setLevel(logging.INFO)
+
+    _log_handler = _BatchStreamHandler()
+    _log_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    _queue_handler = _DroppingQueueHandler(None)  # queue set by _start_log_listener
+    logger.addHandler(_queue_handler)
+
+    def _start_log_listener():
+        """Start this process's listener thread on a fresh queue"""
+        global _log_listener
+        _queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        _log_listener = _BatchingQueueListener(_queue_handler.queue, _log_handler,
+                                               respect_handler_level=True)
+        _log_listener.start()
+
+    def _stop_log_listener():
+        """Drain the queue and stop the current listener"""
+        _log_listener.stop()
+
+    _start_log_listener()
+    atexit.register(_stop_log_listener)
+
+    # Threads don't survive fork(): workers of a preforking server (gunicorn
+    # --preload) start their own listener
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_start_log_listener)
+
+# Prefer orjson's C encoder when the host app has it installed
+try:
+    import orjson
+
+    _json_bytes = orjson.dumps
+except ImportError:
+    import json
+
+    def _json_bytes(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+# Error responses share one shape: the fixed parts are pre-encoded and the
+# request-specific values (JSON-escaped where they may contain user input)
+# are joined between them in one pass
+_ERR_PREFIX = b'{"error":true,"message":'
+_ERR_CORRELATION_ID = b',"correlation_id":'
+_ERR_TIMESTAMP = b',"timestamp":"'
+_ERR_ENDPOINT = b'","endpoint":'
+_ERR_SUFFIX = b'}'
+
+
+def _iso(ts: float) -> str:
+    """Materialize an ISO timestamp from a time.time() value, only when it is needed"""
+    from datetime import datetime, timezone  # error path only; kept out of the module's import time
+
+    # Naive UTC, like the Flask template's timestamps; utcfromtimestamp is deprecated
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+# Correlation IDs are 16-char hex tokens handed out from a pre-generated pool,
+# so the random source is read once per CORRELATION_ID_POOL_SIZE requests
+CORRELATION_ID_POOL_SIZE = 512
+_correlation_ids = iter(())
 
 
-class APIDebugMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, log_requests: bool = True, log_responses: bool = True):
-        super().__init__(app)
+def _new_correlation_id() -> str:
+    """Return the next pooled correlation ID, refilling the pool when it runs out"""
+    global _correlation_ids
+    try:
+        # list iterators hand out each item once, even across threads
+        return next(_correlation_ids)
+    except StopIteration:
+        pool = os.urandom(8 * CORRELATION_ID_POOL_SIZE).hex()
+        _correlation_ids = iter([pool[i:i + 16] for i in range(0, len(pool), 16)])
+        return next(_correlation_ids)
+
+
+# Multi-line log records are joined once per request
+_NL = "\\n"
+
+# Request bodies are truncated to this many bytes in logs
+MAX_BODY_LOG = 500
+
+# Correlation ID of the request being handled; read by get_correlation_id()
+_correlation_id_var: ContextVar[Optional[str]] = ContextVar("api_diagnostics_correlation_id", default=None)
+
+# ASGI header names are lowercase bytes
+_CORRELATION_HEADER = b"x-correlation-id"
+
+# Fixed header of every error response; only content-length and the correlation ID vary
+_JSON_CONTENT_TYPE = (b"content-type", b"application/json")
+
+
+class APIDebugMiddleware:
+    """Pure ASGI middleware: works on the raw scope/receive/send callables, so no
+    Request/Response objects or per-request streams are created"""
+
+    def __init__(self, app, log_requests: bool = True, log_responses: bool = True,
+                 capture_body: bool = False):
+        self.app = app
         self.log_requests = log_requests
         self.log_responses = log_responses
-
-    async def dispatch(self, request: Request, call_next):
-        # Extract or generate correlation ID
-        correlation_id = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
+        # Body capture buffers the upload before the route runs, so it is opt-in
+        self.capture_body = capture_body
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Extract or generate correlation ID (16-char hex token, no UUID formatting).
+        # The encoded form is kept once so an incoming ID is echoed back without re-encoding
+        cid_bytes = None
+        for name, value in scope["headers"]:
+            if name == _CORRELATION_HEADER:
+                cid_bytes = value
+                break
+        if cid_bytes:
+            correlation_id = cid_bytes.decode("latin-1")
+        else:
+            correlation_id = _new_correlation_id()
+            cid_bytes = correlation_id.encode("ascii")
         short_id = correlation_id[:8]  # For readable logs
+        correlation_header = (_CORRELATION_HEADER, cid_bytes)
 
         # Store correlation ID in request state for access in route handlers
-        request.state.correlation_id = correlation_id
+        scope.setdefault("state", {})["correlation_id"] = correlation_id
 
+        method = scope["method"]
+        path = scope["path"]
         start_time = time.time()
-        timestamp = datetime.utcnow().isoformat()
 
-        # Log incoming request
-        if self.log_requests:
-            await self._log_request(correlation_id, short_id, request, timestamp)
+        # Log incoming request (skip body capture and formatting entirely when INFO is disabled)
+        if self.log_requests and logger.isEnabledFor(logging.INFO):
+            receive = await self._log_request(correlation_id, short_id, scope, receive)
 
-        try:
-            response = await call_next(request)
+        response_started = False
+        status_code = None
 
-            # Add correlation ID to response headers
-            response.headers["X-Correlation-ID"] = correlation_id
+        async def send_wrapper(message):
+            nonlocal response_started, status_code
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                # Add correlation ID to response headers
+                message["headers"] = [*message.get("headers", ()), correlation_header]
+            await send(message)
 
-            # Log successful response
-            if self.log_responses:
-                process_time = time.time() - start_time
-                await self._log_response(correlation_id, short_id, request, response, process_time)
-
-            return response
+        cid_token = _correlation_id_var.set(correlation_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
 
         except HTTPException as e:
+            if response_started:
+                raise
             # Handle FastAPI HTTP exceptions (400, 404, etc.)
             process_time = time.time() - start_time
-            await self._log_http_exception(correlation_id, short_id, request, e, process_time)
-
-            # Create enhanced error response
-            error_response = JSONResponse(
-                status_code=e.status_code,
-                content={
-                    "error": True,
-                    "message": e.detail,
-                    "correlation_id": correlation_id,
-                    "timestamp": timestamp,
-                    "endpoint": str(request.url.path)
-                },
-                headers={"X-Correlation-ID": correlation_id}
-            )
-            return error_response
+            self._log_http_exception(correlation_id, short_id, method, path, e, process_time)
+            await self._send_error(send, e.status_code, e.detail, correlation_id, correlation_header,
+                                   start_time, path)
+            return
 
         except Exception as e:
+            if response_started:
+                raise
             # Handle unexpected server errors (500)
             process_time = time.time() - start_time
-            await self._log_server_error(correlation_id, short_id, request, e, process_time)
-
-            # Create enhanced error response
-            error_response = JSONResponse(
-                status_code=500,
-                content={
-                    "error": True,
-                    "message": "Internal server error",
-                    "correlation_id": correlation_id,
-                    "timestamp": timestamp,
-                    "endpoint": str(request.url.path)
-                },
-                headers={"X-Correlation-ID": correlation_id}
-            )
-            return error_response
-
-    async def _log_request(self, correlation_id: str, short_id: str, request: Request, timestamp: str):
-        """Log incoming request details"""
+            self._log_server_error(correlation_id, short_id, method, path, e, process_time)
+            await self._send_error(send, 500, "Internal server error", correlation_id, correlation_header,
+                                   start_time, path)
+            return
+
+        finally:
+            _correlation_id_var.reset(cid_token)
+
+        # Log successful response
+        if self.log_responses and logger.isEnabledFor(logging.INFO):
+            process_time = time.time() - start_time
+            self._log_response(short_id, status_code, process_time)
+
+    @staticmethod
+    async def _send_error(send, status_code: int, message, correlation_id: str, correlation_header,
+                          start_time: float, path: str):
+        """Send an enhanced JSON error response as raw ASGI messages"""
+        body = b"".join((
+            _ERR_PREFIX, _json_bytes(str(message)),
+            _ERR_CORRELATION_ID, _json_bytes(correlation_id),
+            _ERR_TIMESTAMP, _iso(start_time).encode("ascii"),
+            _ERR_ENDPOINT, _json_bytes(path),
+            _ERR_SUFFIX,
+        ))
+
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                _JSON_CONTENT_TYPE,
+                (b"content-length", b"%d" % len(body)),
+                correlation_header,
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def _log_request(self, correlation_id: str, short_id: str, scope, receive):
+        """Log incoming request details; returns the receive callable for the app"""
+        method = scope["method"]
         try:
-            # Try to read request body for POST/PUT requests
+            # Read the request body for POST/PUT requests only when capture is enabled,
+            # then replay the consumed messages to the app
             body = None
-            if request.method in ["POST", "PUT", "PATCH"]:
+            if self.capture_body and method in ("POST", "PUT", "PATCH"):
                 try:
-                    body_bytes = await request.body()
-                    if body_bytes:
-                        body = body_bytes.decode('utf-8')[:500]  # Limit body size in logs
+                    messages = []
+                    preview = []  # Only the first MAX_BODY_LOG bytes are kept for the log
+                    preview_len = 0
+                    while True:
+                        message = await receive()
+                        messages.append(message)
+                        if message["type"] != "http.request":
+                            break
+                        if preview_len < MAX_BODY_LOG:
+                            chunk = message.get("body", b"")[:MAX_BODY_LOG - preview_len]
+                            preview.append(chunk)
+                            preview_len += len(chunk)
+                        if not message.get("more_body", False):
+                            break
+
+                    if preview_len:
+                        body = b"".join(preview).decode('utf-8', 'replace')  # Limit body size in logs
+
+                    receive = self._replay_receive(messages, receive)
                 except:
                     body = "<unable to read body>"
 
-            logger.info(f"🔍 [{short_id}] {request.method} {request.url.path}")
-            logger.info(f"   Correlation ID: {correlation_id}")
-            logger.info(f"   Timestamp: {timestamp}")
-            logger.info(f"   Client IP: {request.client.host if request.client else 'unknown'}")
-            logger.info(f"   User-Agent: {request.headers.get('user-agent', 'unknown')}")
+            headers = dict(scope["headers"])
+            client = scope.get("client")
+
+            # One record per request: a single pass through the logging lock and handlers
+            parts = [
+                f"🔍 [{short_id}] {method} {scope['path']}",
+                f"   Correlation ID: {correlation_id}",
+                f"   Client IP: {client[0] if client else 'unknown'}",
+                f"   User-Agent: {headers.get(b'user-agent', b'unknown').decode('latin-1')}",
+            ]
             if body:
-                logger.info(f"   Request Body: {body}")
+                parts.append(f"   Request Body: {body}")
+            logger.info(_NL.join(parts))
 
         except Exception as e:
             logger.error(f"Error logging request: {e}")
 
-    async def _log_response(self, correlation_id: str, short_id: str, request: Request,
-                          response: Response, process_time: float):
+        return receive
+
+    @staticmethod
+    def _replay_receive(messages, receive):
+        """Hand already-consumed body messages to the app, then defer to the server"""
+        pending = iter(messages)
+
+        async def replay():
+            for message in pending:
+                return message
+            return await receive()
+
+        return replay
+
+    def _log_response(self, short_id: str, status_code: int, process_time: float):
         """Log successful response"""
-        logger.info(f"✅ [{short_id}] {response.status_code} ({process_time:.3f}s)")
+        logger.info(f"✅ [{short_id}] {status_code} ({process_time:.3f}s)")
 
-    async def _log_http_exception(self, correlation_id: str, short_id: str, request: Request,
-                                exception: HTTPException, process_time: float):
+    def _log_http_exception(self, correlation_id: str, short_id: str, method: str, path: str,
+                            exception: HTTPException, process_time: float):
         """Log HTTP exceptions (400, 404, etc.)"""
-        logger.error(f"❌ [{short_id}] {exception.status_code} {exception.detail} ({process_time:.3f}s)")
-        logger.error(f"   Correlation ID: {correlation_id}")
-        logger.error(f"   Endpoint: {request.url.path}")
-        logger.error(f"   Method: {request.method}")
-
-    async def _log_server_error(self, correlation_id: str, short_id: str, request: Request,
-                              error: Exception, process_time: float):
+        logger.error(_NL.join([
+            f"❌ [{short_id}] {exception.status_code} {exception.detail} ({process_time:.3f}s)",
+            f"   Correlation ID: {correlation_id}",
+            f"   Endpoint: {path}",
+            f"   Method: {method}",
+        ]))
+
+    def _log_server_error(self, correlation_id: str, short_id: str, method: str, path: str,
+                          error: Exception, process_time: float):
         """Log unexpected server errors (500)"""
-        logger.error(f"🚫 [{short_id}] SERVER ERROR: {str(error)} ({process_time:.3f}s)")
-        logger.error(f"   Correlation ID: {correlation_id}")
-        logger.error(f"   Endpoint: {request.url.path}")
-        logger.error(f"   Method: {request.method}")
-        logger.error(f"   Stack trace: {traceback.format_exc()}")
+        # The traceback is attached as exc_info and only rendered by the listener thread
+        logger.error(_NL.join([
+            f"🚫 [{short_id}] SERVER ERROR: {str(error)} ({process_time:.3f}s)",
+            f"   Correlation ID: {correlation_id}",
+            f"   Endpoint: {path}",
+            f"   Method: {method}",
+        ]), exc_info=error)
 
 
 # Helper function to get correlation ID in route handlers
-def get_correlation_id(request: Request) -> Optional[str]:
-    """Get the correlation ID from request state"""
-    return getattr(request.state, 'correlation_id', None)
+def get_correlation_id(request: Optional[Request] = None) -> Optional[str]:
+    """Get the correlation ID of the current request (the request argument is optional)"""
+    return _correlation_id_var.get()
 
 
 # Usage example:
@@ -258,181 +491,434 @@ def get_correlation_id(request: Request) -> Optional[str]:
 #
 # app = FastAPI()
 # app.add_middleware(APIDebugMiddleware)
+# app.add_middleware(APIDebugMiddleware, capture_body=True)  # also log request bodies
 '''
     },
 
     'flask': {
         'middleware': '''
 # API Diagnostics Middleware for Flask - Auto-generated
-import json
+import atexit
+import io
 import logging
+import logging.handlers
+import os
+import queue
 import time
-import traceback
-import uuid
-from datetime import datetime
+from contextvars import ContextVar
+from datetime import datetime, timezone
 from functools import wraps
 from typing import Optional
 
-from flask import Flask, request, g, jsonify, Response
+from flask import Flask, request, Response, has_request_context
+
+# Prefer orjson's C encoder when the host app has it installed
+try:
+    import orjson
+
+    def _json_str(obj) -> str:
+        return orjson.dumps(obj, default=str).decode('utf-8')
+except ImportError:
+    import json
+
+    def _json_str(obj) -> str:
+        return json.dumps(obj, default=str)
+
+# Correlation IDs are 16-char hex tokens handed out from a pre-generated pool,
+# so the random source is read once per CORRELATION_ID_POOL_SIZE requests
+CORRELATION_ID_POOL_SIZE = 512
+_correlation_ids = iter(())
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+def _new_correlation_id() -> str:
+    """Return the next pooled correlation ID, refilling the pool when it runs out"""
+    global _correlation_ids
+    try:
+        # list iterators hand out each item once, even across threads
+        return next(_correlation_ids)
+    except StopIteration:
+        pool = os.urandom(8 * CORRELATION_ID_POOL_SIZE).hex()
+        _correlation_ids = iter([pool[i:i + 16] for i in range(0, len(pool), 16)])
+        return next(_correlation_ids)
+
+
+# Correlation ID of the request being handled; read by get_correlation_id()
+_correlation_id_var: ContextVar[Optional[str]] = ContextVar("api_diagnostics_correlation_id", default=None)
+
+# environ key the WSGI wrapper stores (correlation_id, start_time) under
+_ENVIRON_KEY = "api_diagnostics"
+
+# environ key set by the error handler once it has logged the request's error record
+_ERROR_LOGGED_KEY = "api_diagnostics.error_logged"
+
+# Request bodies are truncated to this many bytes in logs
+MAX_BODY_LOG = 500
+
+# Error responses share one shape; only the request-specific values are
+# substituted (JSON-escaped where they may contain user input)
+_ERROR_BODY_TEMPLATE = (
+    '{{"error":true,"message":{message},"correlation_id":{correlation_id},'
+    '"timestamp":"{timestamp}","endpoint":{endpoint}}}'
 )
+
+# Configure logging: request threads only enqueue records, a single
+# listener thread owns the real handler and does the formatting and I/O
+LOG_QUEUE_SIZE = 10000
+LOG_BATCH_SIZE = 256
+
+# Optional JSON-lines log file, searchable with `api-diagnostics search --logs <file>`
+LOG_FILE = os.environ.get("API_DIAGNOSTICS_LOG_FILE")
+LOG_FILE_BUFFER_SIZE = 64 * 1024
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that drops the newest record instead of blocking when full"""
+
+    def prepare(self, record):
+        # Hand the record over unformatted so message and traceback
+        # rendering happen on the listener thread, not the request thread
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
+
+
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """Queue listener that drains records in batches and flushes handlers once per batch"""
+
+    def _monitor(self):
+        q = self.queue
+        while True:
+            batch = [q.get()]
+            try:
+                while len(batch) < LOG_BATCH_SIZE:
+                    batch.append(q.get_nowait())
+            except queue.Empty:
+                pass
+
+            stop = False
+            for record in batch:
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    self.handle(record)
+                q.task_done()
+
+            for handler in self.handlers:
+                handler.flush()
+
+            if stop:
+                break
+
+
+class _DeferredFlushMixin:
+    """Write records without flushing; the listener flushes once per batch"""
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+
+class _BatchStreamHandler(_DeferredFlushMixin, logging.StreamHandler):
+    pass
+
+
+class _BatchFileHandler(_DeferredFlushMixin, logging.FileHandler):
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=LOG_FILE_BUFFER_SIZE, encoding=self.encoding)
+
+
+def _iso(ts: float) -> str:
+    """Materialize an ISO timestamp from a time.time() value, only when it is needed"""
+    # Naive UTC, like the rest of the log timestamps; utcfromtimestamp is deprecated
+    return datetime.fromtimestamp(ts, timezone.utc).replace(tzinfo=None).isoformat()
+
+
+class JsonFormatter(logging.Formatter):
+    """Render each record as one JSON line, merging the structured `api` payload"""
+
+    def format(self, record):
+        data = {
+            "timestamp": _iso(record.created),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        data.update(getattr(record, "api", None) or {})
+        if record.exc_info:
+            data["stack_trace"] = self.formatException(record.exc_info)
+        return _json_str(data)
+
+
+# Configure only our own logger: no basicConfig, and no propagation into the
+# host application's root handlers
 logger = logging.getLogger("api_diagnostics")
+logger.propagate = False
+
+if not logger.handlers:  # the host app (or an earlier import) may have configured it already
+    logger.setLevel(logging.INFO)
+
+    _log_handlers = [_BatchStreamHandler()]
+    if LOG_FILE:
+        _log_handlers.append(_BatchFileHandler(LOG_FILE, encoding='utf-8'))
+    for _handler in _log_handlers:
+        _handler.setFormatter(JsonFormatter())
+
+    _queue_handler = _DroppingQueueHandler(None)  # queue set by _start_log_listener
+    logger.addHandler(_queue_handler)
+
+    def _start_log_listener():
+        """Start this process's listener thread on a fresh queue"""
+        global _log_listener
+        _queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+        _log_listener = _BatchingQueueListener(_queue_handler.queue, *_log_handlers,
+                                               respect_handler_level=True)
+        _log_listener.start()
+
+    def _stop_log_listener():
+        """Drain the queue and stop the current listener"""
+        _log_listener.stop()
+
+    _start_log_listener()
+    atexit.register(_stop_log_listener)
+
+    # Threads don't survive fork(): workers of a preforking server (gunicorn
+    # --preload, uWSGI without lazy-apps) start their own listener
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_start_log_listener)
 
 
 class FlaskAPIDebugger:
-    def __init__(self, app: Flask = None, log_requests: bool = True, log_responses: bool = True):
+    __slots__ = ('log_requests', 'log_responses', 'capture_body')
+
+    def __init__(self, app: Flask = None, log_requests: bool = True, log_responses: bool = True,
+                 capture_body: bool = False):
         self.log_requests = log_requests
         self.log_responses = log_responses
+        # Body capture buffers the upload before the view runs, so it is opt-in
+        self.capture_body = capture_body
         if app:
             self.init_app(app)
 
     def init_app(self, app: Flask):
         """Initialize the Flask app with API debugging middleware"""
-        app.before_request(self._before_request)
-        app.after_request(self._after_request)
+        # One WSGI wrapper handles every request; only errors go through Flask's handler lookup
+        app.wsgi_app = _CorrelationMiddleware(app.wsgi_app, self)
         app.errorhandler(Exception)(self._handle_exception)
 
-    def _before_request(self):
-        """Process incoming request"""
-        # Extract or generate correlation ID
-        correlation_id = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-        short_id = correlation_id[:8]
-
-        # Store in Flask's g object for access throughout request
-        g.correlation_id = correlation_id
-        g.short_id = short_id
-        g.start_time = time.time()
-        g.timestamp = datetime.utcnow().isoformat()
-
-        # Log incoming request
-        if self.log_requests:
-            self._log_request(correlation_id, short_id)
-
-    def _after_request(self, response: Response):
-        """Process outgoing response"""
-        if not hasattr(g, 'correlation_id'):
-            return response
-
-        # Add correlation ID to response headers
-        response.headers['X-Correlation-ID'] = g.correlation_id
-
-        # Log successful response
-        if self.log_responses and hasattr(g, 'start_time'):
-            process_time = time.time() - g.start_time
-            self._log_response(g.correlation_id, g.short_id, response, process_time)
-
-        return response
-
     def _handle_exception(self, error):
         """Handle all exceptions with enhanced logging and response"""
-        if not hasattr(g, 'correlation_id'):
-            g.correlation_id = str(uuid.uuid4())
-            g.short_id = g.correlation_id[:8]
-            g.start_time = time.time()
-            g.timestamp = datetime.utcnow().isoformat()
+        req = request._get_current_object()
 
-        process_time = time.time() - g.start_time if hasattr(g, 'start_time') else 0
+        state = req.environ.get(_ENVIRON_KEY)
+        if state is None:
+            # Error raised outside the WSGI wrapper (e.g. app.wsgi_app replaced after init_app)
+            correlation_id, start_time = _new_correlation_id(), time.time()
+            headers = [('X-Correlation-ID', correlation_id)]
+        else:
+            correlation_id, start_time = state
+            headers = None  # the WSGI wrapper adds X-Correlation-ID
+        short_id = correlation_id[:8]
+
+        process_time = time.time() - start_time
 
         # Determine error type and status code
-        if hasattr(error, 'code') and error.code:
+        status_code = getattr(error, 'code', None)
+        if status_code:
             # HTTP exceptions (400, 404, etc.)
-            status_code = error.code
             message = getattr(error, 'description', str(error))
-            self._log_http_exception(g.correlation_id, g.short_id, error, process_time)
+            self._log_http_exception(req, correlation_id, short_id, error, process_time)
         else:
             # Server errors (500)
             status_code = 500
             message = "Internal server error"
-            self._log_server_error(g.correlation_id, g.short_id, error, process_time)
+            self._log_server_error(req, correlation_id, short_id, error, process_time)
+        # The error record already carries the status; the WSGI wrapper skips its response record
+        req.environ[_ERROR_LOGGED_KEY] = True
 
         # Create enhanced error response
-        error_response = {
-            "error": True,
-            "message": message,
-            "correlation_id": g.correlation_id,
-            "timestamp": g.timestamp,
-            "endpoint": request.path
-        }
-
-        response = jsonify(error_response)
-        response.status_code = status_code
-        response.headers['X-Correlation-ID'] = g.correlation_id
-        return response
-
-    def _log_request(self, correlation_id: str, short_id: str):
+        body = _ERROR_BODY_TEMPLATE.format(
+            message=_json_str(str(message)),
+            correlation_id=_json_str(correlation_id),
+            timestamp=_iso(start_time),
+            endpoint=_json_str(req.path)
+        )
+
+        return Response(
+            body,
+            status=status_code,
+            mimetype='application/json',
+            headers=headers
+        )
+
+    def _log_request(self, environ, correlation_id: str):
         """Log incoming request details"""
         try:
-            # Get request body for POST/PUT requests
+            method = environ['REQUEST_METHOD']
+
+            # Read the request body for POST/PUT requests only when capture is enabled,
+            # then hand the view an in-memory copy of the consumed stream
             body = None
-            if request.method in ["POST", "PUT", "PATCH"]:
+            if self.capture_body and method in ("POST", "PUT", "PATCH"):
                 try:
-                    if request.is_json:
-                        body = json.dumps(request.get_json())[:500]  # Limit size
-                    elif request.data:
-                        body = request.data.decode('utf-8')[:500]
+                    length = int(environ.get('CONTENT_LENGTH') or 0)
+                    if length:
+                        data = environ['wsgi.input'].read(length)
+                        environ['wsgi.input'] = io.BytesIO(data)
+                        body = data[:MAX_BODY_LOG].decode('utf-8', 'replace')  # Limit size
                 except:
                     body = "<unable to read body>"
 
-            logger.info(f"🔍 [{short_id}] {request.method} {request.path}")
-            logger.info(f"   Correlation ID: {correlation_id}")
-            logger.info(f"   Timestamp: {g.timestamp}")
-            logger.info(f"   Client IP: {request.remote_addr}")
-            logger.info(f"   User-Agent: {request.headers.get('User-Agent', 'unknown')}")
+            # One structured record per request; serialized by the listener thread
+            payload = {
+                "correlation_id": correlation_id,
+                "method": method,
+                "endpoint": _path(environ),
+                "client_ip": environ.get('REMOTE_ADDR'),
+                "user_agent": environ.get('HTTP_USER_AGENT', 'unknown'),
+            }
             if body:
-                logger.info(f"   Request Body: {body}")
+                payload["request_body"] = body
+
+            logger.info("request", extra={"api": payload})
 
         except Exception as e:
-            logger.error(f"Error logging request: {e}")
+            logger.error("Error logging request: %s", e)
 
-    def _log_response(self, correlation_id: str, short_id: str, response: Response, process_time: float):
+    def _log_response(self, environ, correlation_id: str, status_code: int, process_time: float):
         """Log successful response"""
-        logger.info(f"✅ [{short_id}] {response.status_code} ({process_time:.3f}s)")
+        payload = {
+            "correlation_id": correlation_id,
+            "method": environ['REQUEST_METHOD'],
+            "endpoint": _path(environ),
+            "status_code": status_code,
+            "process_time": round(process_time, 3),
+        }
+        logger.info("response", extra={"api": payload})
 
-    def _log_http_exception(self, correlation_id: str, short_id: str, error, process_time: float):
+    def _log_http_exception(self, req, correlation_id: str, short_id: str, error, process_time: float):
         """Log HTTP exceptions (400, 404, etc.)"""
-        status_code = getattr(error, 'code', 'unknown')
-        message = getattr(error, 'description', str(error))
-
-        logger.error(f"❌ [{short_id}] {status_code} {message} ({process_time:.3f}s)")
-        logger.error(f"   Correlation ID: {correlation_id}")
-        logger.error(f"   Endpoint: {request.path}")
-        logger.error(f"   Method: {request.method}")
+        payload = {
+            "correlation_id": correlation_id,
+            "method": req.method,
+            "endpoint": req.path,
+            "status_code": getattr(error, 'code', 'unknown'),
+            "error_message": getattr(error, 'description', str(error)),
+            "process_time": round(process_time, 3),
+        }
+        logger.error("http_exception", extra={"api": payload})
 
-    def _log_server_error(self, correlation_id: str, short_id: str, error, process_time: float):
+    def _log_server_error(self, req, correlation_id: str, short_id: str, error, process_time: float):
         """Log unexpected server errors (500)"""
-        logger.error(f"🚫 [{short_id}] SERVER ERROR: {str(error)} ({process_time:.3f}s)")
-        logger.error(f"   Correlation ID: {correlation_id}")
-        logger.error(f"   Endpoint: {request.path}")
-        logger.error(f"   Method: {request.method}")
-        logger.error(f"   Stack trace: {traceback.format_exc()}")
+        payload = {
+            "correlation_id": correlation_id,
+            "method": req.method,
+            "endpoint": req.path,
+            "status_code": 500,
+            "error_message": str(error),
+            "process_time": round(process_time, 3),
+        }
+        logger.error("server_error", exc_info=error, extra={"api": payload})
+
+
+def _path(environ) -> str:
+    """Request path from the WSGI environ, decoded the way Flask's request.path is"""
+    return environ.get('PATH_INFO', '').encode('latin-1').decode('utf-8', 'replace') or '/'
+
+
+class _CorrelationMiddleware:
+    """WSGI wrapper around app.wsgi_app: a single call per request covers the
+    correlation ID, timing, response header and request/response logging"""
+
+    __slots__ = ('wsgi_app', 'debugger')
+
+    def __init__(self, wsgi_app, debugger: FlaskAPIDebugger):
+        self.wsgi_app = wsgi_app
+        self.debugger = debugger
+
+    def __call__(self, environ, start_response):
+        debugger = self.debugger
+
+        # Extract or generate correlation ID (16-char hex token, no UUID formatting);
+        # WSGI already exposes the header as a str, no request proxy involved
+        correlation_id = environ.get('HTTP_X_CORRELATION_ID') or _new_correlation_id()
+        start_time = time.time()
+        # Read back by the error handler
+        environ[_ENVIRON_KEY] = (correlation_id, start_time)
+
+        # Log incoming request (skip body extraction entirely when INFO is disabled)
+        log_info = logger.isEnabledFor(logging.INFO)
+        if debugger.log_requests and log_info:
+            debugger._log_request(environ, correlation_id)
+
+        correlation_header = ('X-Correlation-ID', correlation_id)
+        status_code = None
+
+        def start_response_wrapper(status, headers, exc_info=None):
+            nonlocal status_code
+            status_code = int(status[:3])
+            # Add correlation ID to response headers
+            headers.append(correlation_header)
+            return start_response(status, headers, exc_info)
+
+        cid_token = _correlation_id_var.set(correlation_id)
+        try:
+            response = self.wsgi_app(environ, start_response_wrapper)
+        finally:
+            _correlation_id_var.reset(cid_token)
+
+        # Log the response (errors were already logged by the error handler)
+        if (debugger.log_responses and log_info and status_code is not None
+                and _ERROR_LOGGED_KEY not in environ):
+            debugger._log_response(environ, correlation_id, status_code, time.time() - start_time)
+
+        return response
 
 
 # Helper function to get correlation ID in route handlers
 def get_correlation_id() -> Optional[str]:
-    """Get the correlation ID from Flask's g object"""
-    return getattr(g, 'correlation_id', None)
+    """Get the correlation ID of the current request"""
+    correlation_id = _correlation_id_var.get()
+    # The var is reset once the view returns; a streamed body (stream_with_context)
+    # is produced later, but still inside the request context
+    if correlation_id is None and has_request_context():
+        state = request.environ.get(_ENVIRON_KEY)
+        if state is not None:
+            correlation_id = state[0]
+    return correlation_id
 
 
 # Decorator for individual route debugging
 def debug_route(f):
-    """Decorator to add extra debugging to specific routes"""
+    """Decorator to add extra debugging to specific routes
+
+    The level is checked once at decoration time: with INFO disabled the
+    route is returned unwrapped, so set the log level before defining routes.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return f
+
+    f_name = f.__name__
+
     @wraps(f)
     def decorated_function(*args, **kwargs):
         correlation_id = get_correlation_id()
         short_id = correlation_id[:8] if correlation_id else 'unknown'
 
-        logger.info(f"🎯 [{short_id}] Entering route: {f.__name__}")
+        logger.info("🎯 [%s] Entering route: %s", short_id, f_name)
 
         try:
             result = f(*args, **kwargs)
-            logger.info(f"🎯 [{short_id}] Route completed: {f.__name__}")
+            logger.info("🎯 [%s] Route completed: %s", short_id, f_name)
             return result
         except Exception as e:
-            logger.error(f"🎯 [{short_id}] Route error in {f.__name__}: {str(e)}")
+            logger.error("🎯 [%s] Route error in %s: %s", short_id, f_name, e)
             raise
 
     return decorated_function
@@ -444,6 +930,7 @@ def debug_route(f):
 #
 # app = Flask(__name__)
 # debugger = FlaskAPIDebugger(app)
+# debugger = FlaskAPIDebugger(app, capture_body=True)  # also log request bodies
 #
 # @app.route('/users/<int:user_id>')
 # @debug_route
@@ -0,0 +1,50 @@
+"""
+Shared pytest configuration
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+# Set to a file path to have each test result appended to it as a JSON line
+# as soon as the test finishes, instead of only seeing results at session end
+RESULTS_PATH = os.environ.get('API_DIAGNOSTICS_TEST_RESULTS')
+
+# Add src directory to Python path (once per session, for every test module)
+SRC_DIR = str(Path(__file__).parent.parent / 'src')
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+def pytest_configure(config):
+    """Register xdist_group (so grouped classes run without pytest-xdist) and pick the results writer"""
+    # With `-n auto --dist loadgroup`, each group runs on a single worker
+    config.addinivalue_line('markers', 'xdist_group(name): run the marked tests on one xdist worker')
+
+    # xdist workers forward their reports to the controller, which does the
+    # writing, so results are written by a single process
+    global RESULTS_PATH
+    if hasattr(config, 'workerinput'):
+        RESULTS_PATH = None
+
+
+def pytest_runtest_logreport(report):
+    """Append each test's outcome to RESULTS_PATH while the session is still running"""
+    if not RESULTS_PATH or not (report.when == 'call' or report.outcome != 'passed'):
+        return
+
+    line = json.dumps({
+        'nodeid': report.nodeid,
+        'when': report.when,
+        'outcome': report.outcome,
+        'duration': report.duration,
+        'longrepr': str(report.longrepr) if report.failed else None,
+    }) + '\n'
+
+    # One O_APPEND write per record: readers never see a partial rewrite
+    fd = os.open(RESULTS_PATH, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        os.write(fd, line.encode('utf-8'))
+    finally:
+        os.close(fd)
@@ -2,12 +2,10 @@
 Tests for Core Functionality
 """
 
+import time
 import pytest
-import sys
-from pathlib import Path
-
-# Add src directory to Python path
-sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
 
 from core import (
     generate_correlation_id,
@@ -18,10 +16,40 @@ from core import (
     create_log_entry,
     parse_log_line,
     filter_log_entries,
+    search_logs_by_correlation_id,
+    search_logs_by_error_type,
+    search_logs_recent,
     LogSearcher,
     LogEntry
 )
 
+# Fixed, valid UUID for tests that only need a well-formed ID
+SAMPLE_UUID = '12345678-1234-4234-8234-123456789abc'
+
+
+def _utc_log(tmp_path, minutes_ago_list):
+    """Write a log with naive UTC ISO timestamps, as the middleware does"""
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    log_file = tmp_path / 'app.log'
+    lines = []
+    for minutes_ago in minutes_ago_list:
+        timestamp = (now - timedelta(minutes=minutes_ago)).isoformat()
+        lines.append(f'{{"timestamp": "{timestamp}", "correlation_id": "id-{minutes_ago}", "status_code": 200}}')
+    log_file.write_text('\n'.join(lines) + '\n')
+    return str(log_file)
+
+
+@pytest.fixture
+def non_utc_tz(monkeypatch):
+    """Run the test with the process's local time zone set away from UTC"""
+    if not hasattr(time, 'tzset'):
+        pytest.skip('time.tzset is not available on this platform')
+    monkeypatch.setenv('TZ', 'Asia/Tokyo')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
 
 class TestCorrelationFunctions:
     def test_generate_correlation_id(self):
@@ -44,6 +72,15 @@ class TestCorrelationFunctions:
         assert validate_correlation_id(None) is False
         assert validate_correlation_id(123) is False
 
+        # Hex tokens generated by the middleware (16 chars) and uuid4().hex (32 chars)
+        assert validate_correlation_id('0123456789abcdef') is True
+        assert validate_correlation_id('0123456789abcdef0123456789abcdef') is True
+        assert validate_correlation_id('0123456789abcdeg') is False
+
+        # Strict mode only accepts real UUIDs
+        assert validate_correlation_id(valid_id, strict=True) is True
+        assert validate_correlation_id('0123456789abcdef', strict=True) is False
+
     def test_format_correlation_id(self):
         """Test correlation ID formatting"""
         full_id = generate_correlation_id()
@@ -62,61 +99,36 @@ class TestCorrelationFunctions:
         assert isinstance(short_id, str)
 
 
-class TestLogFormatting:
-    def test_format_log_entry_json(self):
-        """Test JSON log entry formatting"""
-        entry = LogEntry(
-            timestamp='2024-01-15T10:30:45Z',
-            level='ERROR',
-            correlation_id='test-123-456-789',
-            endpoint='/api/test',
-            method='POST',
-            status_code=400,
-            error_message='Test error'
-        )
-
-        formatted = format_log_entry(entry, 'json')
-        assert 'test-123-456-789' in formatted
-        assert 'ERROR' in formatted
-        assert '400' in formatted
-
-    def test_format_log_entry_human(self):
-        """Test human-readable log entry formatting"""
-        # Use a valid UUID for testing
-        test_id = generate_correlation_id()
-        entry = LogEntry(
-            timestamp='2024-01-15T10:30:45Z',
-            level='ERROR',
-            correlation_id=test_id,
-            endpoint='/api/test',
-            method='POST',
-            status_code=400,
-            error_message='Test error'
-        )
+@pytest.fixture
+def sample_entry():
+    """Error entry shared by the formatting tests"""
+    return LogEntry(
+        timestamp='2024-01-15T10:30:45Z',
+        level='ERROR',
+        correlation_id=SAMPLE_UUID,
+        endpoint='/api/test',
+        method='POST',
+        status_code=400,
+        error_message='Test error'
+    )
 
-        formatted = format_log_entry(entry, 'human')
-        assert '❌' in formatted  # Error emoji
-        assert f'[{test_id[:8]}]' in formatted  # Short ID
-        assert 'POST /api/test' in formatted
-        assert 'Status: 400' in formatted
-
-    def test_format_log_entry_compact(self):
-        """Test compact log entry formatting"""
-        # Use a valid UUID for testing
-        test_id = generate_correlation_id()
-        entry = LogEntry(
-            timestamp='2024-01-15T10:30:45Z',
-            level='INFO',
-            correlation_id=test_id,
-            endpoint='/api/test',
-            method='GET',
-            status_code=200
-        )
 
-        formatted = format_log_entry(entry, 'compact')
-        assert '✅' in formatted  # Success emoji
-        assert f'[{test_id[:8]}]' in formatted
-        assert '200 GET /api/test' in formatted
+class TestLogFormatting:
+    @pytest.mark.parametrize("fmt,overrides,markers", [
+        ('json', {}, [SAMPLE_UUID, 'ERROR', '400']),
+        # Error emoji, short ID, request line and status
+        ('human', {}, ['❌', f'[{SAMPLE_UUID[:8]}]', 'POST /api/test', 'Status: 400']),
+        # Success emoji on a successful GET
+        ('compact', {'level': 'INFO', 'method': 'GET', 'status_code': 200, 'error_message': None},
+         ['✅', f'[{SAMPLE_UUID[:8]}]', '200 GET /api/test']),
+    ])
+    def test_format_log_entry(self, sample_entry, fmt, overrides, markers):
+        """Test JSON, human-readable and compact log entry formatting"""
+        entry = replace(sample_entry, **overrides)
+
+        formatted = format_log_entry(entry, fmt)
+        for marker in markers:
+            assert marker in formatted
 
     def test_create_log_entry(self):
         """Test log entry creation"""
@@ -148,8 +160,7 @@ class TestLogFormatting:
 
     def test_parse_log_line_middleware_format(self):
         """Test parsing middleware log format"""
-        # Use a valid UUID format in the log line
-        test_id = generate_correlation_id()
+        test_id = SAMPLE_UUID
         log_line = f"2024-01-15 10:30:45 - api_diagnostics - ERROR - ❌ [{test_id[:8]}] POST /api/users 400 Validation failed"
 
         entry = parse_log_line(log_line)
@@ -158,6 +169,9 @@ class TestLogFormatting:
         assert entry.method == 'POST'
         assert entry.endpoint == '/api/users'
         assert entry.status_code == 400
+        assert entry.error_message == 'Validation failed'
+        # The text format has no parseable timestamp
+        assert entry.timestamp == ''
 
     def test_filter_log_entries(self):
         """Test log entry filtering"""
@@ -190,15 +204,71 @@ class TestLogFormatting:
         assert len(filtered) == 2
 
 
+class TestLogFileSearch:
+    def test_search_logs_by_correlation_id(self, tmp_path):
+        """Test scanning a log file for a correlation ID"""
+        log_file = tmp_path / 'app.log'
+        log_file.write_text(
+            'unrelated line\n'
+            '{"correlation_id": "ABCDEF0123456789", "method": "GET", "endpoint": "/api/a", "status_code": 500}\n'
+            'raw abcdef0123456789 line abcdef0123456789\n'
+        )
+
+        entries = search_logs_by_correlation_id('abcdef0123456789', [str(log_file)])
+        assert len(entries) == 2
+        assert entries[0].endpoint == '/api/a'
+        assert entries[0].status_code == 500
+        assert entries[1].error_message.startswith('Raw log line 3:')
+
+        entries = search_logs_by_correlation_id('abcdef0123456789', [str(log_file)], limit=1)
+        assert [e.endpoint for e in entries] == ['/api/a']
+
+    def test_search_empty_log_file(self, tmp_path):
+        """Test scanning an empty log file"""
+        log_file = tmp_path / 'empty.log'
+        log_file.write_text('')
+
+        assert search_logs_by_correlation_id('abcdef0123456789', [str(log_file)]) == []
+
+    def test_search_logs_by_error_type(self, tmp_path):
+        """Test scanning a log file for error lines"""
+        log_file = tmp_path / 'app.log'
+        log_file.write_text(
+            '{"timestamp": "2024-01-01T00:00:00", "correlation_id": "a", "status_code": 200}\n'
+            '{"timestamp": "2024-01-01T00:00:01", "correlation_id": "b", "status_code": 404}\n'
+            '{"timestamp": "2024-01-01T00:00:02", "correlation_id": "c", "status_code": 502}'
+        )
+
+        entries = search_logs_by_error_type('error', [str(log_file)])
+        assert [e.correlation_id for e in entries] == ['c', 'b']
+
+        assert len(search_logs_by_error_type('error', [str(log_file)], limit=1)) == 1
+
+    def test_search_logs_recent_reads_newest_first(self, tmp_path):
+        """Test recent search stops at the limit and at the time cutoff"""
+        log_file = _utc_log(tmp_path, (180, 3, 2, 1))
+
+        entries = search_logs_recent(hours=1, log_paths=[log_file])
+        assert [e.correlation_id for e in entries] == ['id-1', 'id-2', 'id-3']
+
+        entries = search_logs_recent(hours=24, log_paths=[log_file], limit=2)
+        assert [e.correlation_id for e in entries] == ['id-1', 'id-2']
+
+    def test_search_logs_recent_cutoff_is_utc(self, tmp_path, non_utc_tz):
+        """Test the recent cutoff uses the same UTC clock as the log writer"""
+        log_file = _utc_log(tmp_path, (180, 3, 2, 1))
+
+        entries = search_logs_recent(hours=1, log_paths=[log_file])
+        assert [e.correlation_id for e in entries] == ['id-1', 'id-2', 'id-3']
+
+
 class TestLogSearcher:
-    @pytest.mark.asyncio
-    async def test_search_by_correlation_id(self):
+    def test_search_by_correlation_id(self):
         """Test searching by correlation ID"""
-        results = await LogSearcher.search_by_correlation_id('test-123')
+        results = LogSearcher.search_by_correlation_id('test-123')
         assert isinstance(results, list)
 
-    @pytest.mark.asyncio
-    async def test_filter_by_error_type(self):
+    def test_filter_by_error_type(self):
         """Test filtering by error type"""
-        results = await LogSearcher.filter_by_error_type('400')
+        results = LogSearcher.filter_by_error_type('400')
         assert isinstance(results, list)
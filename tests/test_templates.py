@@ -0,0 +1,63 @@
+"""
+Tests for the Generated Middleware Templates
+"""
+
+import atexit
+import logging
+import os
+import sys
+import types
+
+import pytest
+
+from templates import BACKEND_TEMPLATES
+
+
+@pytest.fixture
+def load_middleware(tmp_path, monkeypatch):
+    """Import a backend middleware template as a fresh module, logging to a file"""
+    logger = logging.getLogger('api_diagnostics')
+    saved_handlers = logger.handlers[:]
+    modules = []
+
+    def load(framework):
+        pytest.importorskip(framework)
+        logger.handlers.clear()
+        log_path = tmp_path / f'{framework}.log'
+        # The template's stream handler binds sys.stderr when it is created
+        monkeypatch.setattr(sys, 'stderr', open(log_path, 'w'))
+        module = types.ModuleType(f'{framework}_api_middleware')
+        exec(compile(BACKEND_TEMPLATES[framework]['middleware'], module.__name__, 'exec'), module.__dict__)
+        monkeypatch.undo()
+        modules.append(module)
+        return module, log_path
+
+    yield load
+
+    for module in modules:
+        atexit.unregister(module._stop_log_listener)
+        module._stop_log_listener()
+    logger.handlers[:] = saved_handlers
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires os.fork')
+@pytest.mark.parametrize('framework', ['flask', 'fastapi'])
+def test_logging_survives_fork(load_middleware, framework):
+    """Test a forked worker (e.g. gunicorn --preload) still writes middleware logs"""
+    module, log_path = load_middleware(framework)
+
+    pid = os.fork()
+    if pid == 0:
+        # Child: log, drain the listener, and report whether it was running
+        status = 1
+        try:
+            alive = module._log_listener._thread.is_alive()
+            module.logger.info('logged from worker %d', os.getpid())
+            module._log_listener.stop()
+            status = 0 if alive else 2
+        finally:
+            os._exit(status)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert f'logged from worker {pid}' in log_path.read_text()